@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+价格分析 — 把价格历史装进 NumPy 数组（商品 × 门店 × 天）批量计算
+
+  basket     整篮总价：各门店都有价的商品求和，外加"每样挑最便宜"的总价
+  rolling    滚动最低 / 中位价（按天前向填充，即"当天有效价"）
+  specials   特价频率：有观测的天里处于特价的比例
+  unit       统一单位价：Woolworths CupString / Coles ofMeasurePrice → $/kg、$/L、$/ea
+
+门店轴是零售商；同一零售商在窗口内有多个分店时拆成"零售商 分店"各占一列。
+日报（monitor.py / poller.py）用 insights()；也可以直接看报告：
+    python analytics.py [--days 30] [--json]
+"""
+import json
+import re
+import warnings
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+
+WINDOW = 30   # 天
+
+_UNIT_RE = re.compile(r"\$?\s*([\d.]+)\s*(?:/|per)\s*([\d.]*)\s*(kg|g|ml|l|ea|each)\b", re.I)
+# 统一到的单位和换算系数
+_UNIT_SCALE = {"kg": ("kg", 1), "g": ("kg", 1000), "l": ("L", 1), "ml": ("L", 1000),
+               "ea": ("ea", 1), "each": ("ea", 1)}
+
+
+@dataclass(slots=True)
+class Cube:
+    items:   list[str]
+    stores:  list[str]        # 列标签
+    days:    np.ndarray       # datetime64[D]，长度 D
+    price:   np.ndarray       # (I, S, D) float，当天最后一次观测，没有观测为 NaN
+    special: np.ndarray       # (I, S, D) bool
+    seen:    np.ndarray       # (I, S, D) bool，当天有观测
+    unit:    np.ndarray       # (I, S) object，最近一次的原始单位价字符串
+
+
+def load(conn, days: int = WINDOW, now: datetime | None = None) -> Cube:
+    """读最近 days 天的 observations，按 ts 顺序写入数组（同一天后写的覆盖先写的）"""
+    now   = now or datetime.now()
+    start = (now - timedelta(days=days - 1)).date()
+    rows  = conn.execute(
+        "SELECT item, store, COALESCE(branch, ''), ts, price, on_special, COALESCE(unit, '') "
+        "FROM observations WHERE ts >= ? AND price IS NOT NULL ORDER BY ts",
+        (start.isoformat(),),
+    ).fetchall()
+
+    branches: dict[str, set] = {}
+    for _, store, branch, *_ in rows:
+        branches.setdefault(store, set()).add(branch)
+    label = {(s, b): f"{s} {b}" if len(bs) > 1 else s for s, bs in branches.items() for b in bs}
+
+    items  = list(dict.fromkeys(r[0] for r in rows))
+    stores = list(dict.fromkeys(label[(r[1], r[2])] for r in rows))
+    ii = np.array(_index(items, (r[0] for r in rows)), dtype=np.intp)
+    si = np.array(_index(stores, (label[(r[1], r[2])] for r in rows)), dtype=np.intp)
+    di = (np.array([r[3][:10] for r in rows], dtype="datetime64[D]")
+          - np.datetime64(start, "D")).astype(np.intp)
+
+    shape   = (len(items), len(stores), days)
+    price   = np.full(shape, np.nan)
+    special = np.zeros(shape, dtype=bool)
+    seen    = np.zeros(shape, dtype=bool)
+    unit    = np.full(shape[:2], "", dtype=object)
+    if rows:
+        price[ii, si, di]   = [r[4] for r in rows]
+        special[ii, si, di] = [bool(r[5]) for r in rows]
+        seen[ii, si, di]    = True
+        unit[ii, si]        = [r[6] for r in rows]
+    return Cube(items, stores, np.datetime64(start, "D") + np.arange(days), price, special, seen, unit)
+
+
+def _index(labels: list[str], values) -> list[int]:
+    pos = {v: i for i, v in enumerate(labels)}
+    return [pos[v] for v in values]
+
+
+# ── 计算 ──────────────────────────────────────────────────────────────────────
+
+def ffill(a: np.ndarray) -> np.ndarray:
+    """沿最后一维前向填充 NaN（开头的 NaN 保留）"""
+    idx = np.where(np.isnan(a), 0, np.arange(a.shape[-1]))
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    return np.take_along_axis(a, idx, axis=-1)
+
+
+def current(cube: Cube) -> np.ndarray:
+    """(I, S) 窗口内最近一次已知价格"""
+    return ffill(cube.price)[..., -1]
+
+
+def rolling(cube: Cube, window: int = 7) -> tuple[np.ndarray, np.ndarray]:
+    """(I, S, D) 的滚动最低价和滚动中位价，窗口按天、基于前向填充后的当天有效价"""
+    filled = ffill(cube.price)
+    padded = np.concatenate([np.full(filled.shape[:-1] + (window - 1,), np.nan), filled], axis=-1)
+    view   = np.lib.stride_tricks.sliding_window_view(padded, window, axis=-1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # 全 NaN 的窗口
+        return np.nanmin(view, axis=-1), np.nanmedian(view, axis=-1)
+
+
+def basket(cube: Cube) -> tuple[list[tuple[str, float]], float, list[str]]:
+    """
+    ([(门店, 总价)] 从便宜到贵, 每样挑最便宜的总价, 参与比较的商品)。
+    只比较在所有门店都有价的商品，否则总价没有可比性。
+    """
+    now    = current(cube)
+    common = ~np.isnan(now).any(axis=1)
+    totals = now[common].sum(axis=0)
+    order  = np.argsort(totals)
+    mix    = float(now[common].min(axis=1).sum()) if common.any() else 0.0
+    return ([(cube.stores[j], float(totals[j])) for j in order] if common.any() else [],
+            mix, [it for it, c in zip(cube.items, common) if c])
+
+
+def special_frequency(cube: Cube) -> np.ndarray:
+    """(I, S) 有观测的天里处于特价的比例；没有观测为 NaN"""
+    n = cube.seen.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, cube.special.sum(axis=-1) / n, np.nan)
+
+
+def unit_prices(cube: Cube) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ((I, S) 统一单位价, (I, S) 单位)。只解析去重后的字符串，再按下标铺回去；
+    解析不了的为 NaN / ""。
+    """
+    uniq, inverse = np.unique(cube.unit.astype(str), return_inverse=True)
+    parsed = [parse_unit(u) for u in uniq]
+    values = np.array([p[0] if p else np.nan for p in parsed])
+    units  = np.array([p[1] if p else "" for p in parsed], dtype=object)
+    shape  = cube.unit.shape
+    return values[inverse].reshape(shape), units[inverse].reshape(shape)
+
+
+def parse_unit(text: str) -> tuple[float, str] | None:
+    """"$0.83 / 100G"、"$2.50 per 1kg" → (8.3, "kg")、(2.5, "kg")"""
+    m = _UNIT_RE.search(text or "")
+    if not m:
+        return None
+    unit, scale = _UNIT_SCALE[m.group(3).lower()]
+    qty = float(m.group(2) or 1)
+    if qty <= 0:
+        return None
+    return round(float(m.group(1)) / qty * scale, 4), unit
+
+
+# ── 汇总 ──────────────────────────────────────────────────────────────────────
+
+def report(cube: Cube, window: int = WINDOW) -> dict:
+    """CLI 报告和日报共用的全部结果（纯 Python 类型，可直接转 JSON）"""
+    now           = current(cube)
+    lows, medians = rolling(cube, min(window, len(cube.days)))
+    freq          = special_frequency(cube)
+    unit, units   = unit_prices(cube)
+    totals, mix, common = basket(cube)
+
+    low_now, med_now = lows[..., -1], medians[..., -1]
+    items = {}
+    for i, item in enumerate(cube.items):
+        row = {}
+        for j, store in enumerate(cube.stores):
+            if np.isnan(now[i, j]):
+                continue
+            row[store] = {
+                "price":        float(now[i, j]),
+                "low":          float(low_now[i, j]),
+                "median":       float(med_now[i, j]),
+                "at_low":       bool(now[i, j] <= low_now[i, j] + 0.005),
+                "special_freq": None if np.isnan(freq[i, j]) else round(float(freq[i, j]), 3),
+                "unit_price":   None if np.isnan(unit[i, j]) else float(unit[i, j]),
+                "unit":         units[i, j] or None,
+            }
+        if row:
+            items[item] = row
+    return {
+        "window_days": window,
+        "stores":      cube.stores,
+        "basket":      {"totals": totals, "cheapest_mix": mix, "items": common},
+        "items":       items,
+    }
+
+
+def best_unit(row: dict) -> tuple[str, float, str] | None:
+    """同一单位里统一单位价最低的 (门店, 单位价, 单位)"""
+    cands = [(v["unit_price"], s, v["unit"]) for s, v in row.items() if v["unit_price"] is not None]
+    if not cands:
+        return None
+    unit = max({u for *_, u in cands}, key=lambda u: sum(1 for *_, x in cands if x == u))
+    price, store, _ = min(c for c in cands if c[2] == unit)
+    return store, price, unit
+
+
+def insights(conn, window: int = WINDOW) -> dict:
+    """日报用：{"items": {item: {"low", "low_store"}}, "basket": {...}}"""
+    rep = report(load(conn, window), window)
+    out = {}
+    for item, row in rep["items"].items():
+        store = min(row, key=lambda s: row[s]["low"])
+        out[item] = {"low": row[store]["low"], "low_store": store}
+    return {"window_days": window, "items": out, "basket": rep["basket"]}
+
+
+def format_report(rep: dict) -> str:
+    lines = [f"价格分析（最近 {rep['window_days']} 天）", ""]
+    b = rep["basket"]
+    if b["totals"]:
+        lines.append(f"整篮总价（{len(b['items'])} 个各店都有价的商品）：")
+        lines += [f"  {store:<36}${total:>8.2f}" for store, total in b["totals"]]
+        lines.append(f"  {'每样挑最便宜':<30}${b['cheapest_mix']:>8.2f}")
+        lines.append("")
+    for item, row in rep["items"].items():
+        lines.append(item)
+        for store, v in row.items():
+            tag  = " ⬇最低" if v["at_low"] else ""
+            freq = f"  特价 {v['special_freq']:.0%}" if v["special_freq"] else ""
+            unit = f"  ${v['unit_price']:.2f}/{v['unit']}" if v["unit_price"] is not None else ""
+            lines.append(f"  {store:<36}${v['price']:>7.2f}  低 ${v['low']:.2f}  中位 ${v['median']:.2f}"
+                         f"{unit}{freq}{tag}")
+        if best := best_unit(row):
+            lines.append(f"  单位价最低: {best[0]} ${best[1]:.2f}/{best[2]}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    from storage import history
+
+    ap = argparse.ArgumentParser(description="价格历史分析报告")
+    ap.add_argument("--days", type=int, default=WINDOW, help="分析窗口（天）")
+    ap.add_argument("--json", action="store_true", help="输出 JSON")
+    args = ap.parse_args()
+    with closing(history.connect()) as conn:
+        rep = report(load(conn, args.days), args.days)
+    print(json.dumps(rep, indent=2, ensure_ascii=False) if args.json else format_report(rep))
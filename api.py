@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+价格历史查询 — 只读的本地 HTTP 服务和命令行（查询本身在 storage.query）
+
+    python api.py latest   [--item X] [--store S]
+    python api.py series   ITEM [--store S] [--branch B] [--since 2026-01-01] [--until ...]
+    python api.py cheapest [--store S]
+    python api.py items
+    python api.py serve    [--host 127.0.0.1] [--port 8163]
+命令行默认输出 NDJSON，--csv 输出 CSV。
+
+HTTP 端点与命令同名，参数放在 query string（GET /series?item=Milk&since=2026-01-01）；
+?format=csv 或 Accept: text/csv 返回 CSV，否则 NDJSON。
+结果按块（chunked）边查边发，看板和电子表格可以直接拉数据，不用重新跑抓取。
+"""
+import itertools
+import json
+import sys
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from storage import query
+
+HOST  = "127.0.0.1"
+PORT  = 8163
+CHUNK = 64 * 1024   # HTTP 每块攒到这么多字符再发
+
+# 端点 → (查询函数, 必填参数, 可选参数)
+ENDPOINTS = {
+    "latest":   (query.latest,   (),        ("item", "store")),
+    "series":   (query.series,   ("item",), ("store", "branch", "since", "until")),
+    "cheapest": (query.cheapest, (),        ("store",)),
+    "items":    (query.items,    (),        ()),
+}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def run(conn, endpoint: str, params: dict):
+    """校验参数并返回行生成器；端点或参数不对抛 QueryError"""
+    if endpoint not in ENDPOINTS:
+        raise QueryError(f"未知端点 '{endpoint}'，可用: {', '.join(ENDPOINTS)}")
+    fn, required, optional = ENDPOINTS[endpoint]
+    if missing := [p for p in required if not params.get(p)]:
+        raise QueryError(f"{endpoint} 缺少参数: {', '.join(missing)}")
+    if unknown := sorted(set(params) - set(required) - set(optional)):
+        raise QueryError(f"{endpoint} 不认识的参数: {', '.join(unknown)}")
+    return fn(conn, **params)
+
+
+def encode(rows, fmt: str):
+    return query.csv_lines(rows) if fmt == "csv" else query.ndjson(rows)
+
+
+# ── HTTP ─────────────────────────────────────────────────────────────────────
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # chunked 需要 1.1
+
+    def do_GET(self):
+        parts  = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        fmt    = params.pop("format", None) or ("csv" if "text/csv" in self.headers.get("Accept", "") else "ndjson")
+        try:
+            with closing(query.connect()) as conn:
+                rows = run(conn, parts.path.strip("/"), params)
+                # 先取第一行：查询本身出错时还能回一个正常的错误响应
+                first = next(rows, None)
+                rows  = rows if first is None else itertools.chain([first], rows)
+                self._stream(encode(rows, fmt), "text/csv" if fmt == "csv" else "application/x-ndjson")
+        except QueryError as e:
+            self._error(404 if "未知端点" in str(e) else 400, str(e))
+        except FileNotFoundError as e:
+            self._error(503, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # 客户端中途断开
+
+    def _stream(self, lines, ctype: str):
+        self.send_response(200)
+        self.send_header("Content-Type", f"{ctype}; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in _chunks(lines):
+            data = chunk.encode("utf-8")
+            self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _error(self, status: int, message: str):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        print(f"  [api] {self.address_string()} {fmt % args}")
+
+
+def _chunks(lines, size: int = CHUNK):
+    buf, n = [], 0
+    for line in lines:
+        buf.append(line)
+        n += len(line)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def serve(host: str = HOST, port: int = PORT):
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"价格查询服务: http://{host}:{port}/  （端点: {', '.join(ENDPOINTS)}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ── 命令行 ───────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    import argparse
+    ap  = argparse.ArgumentParser(description="价格历史查询（只读）")
+    sub = ap.add_subparsers(dest="endpoint", required=True)
+    p = sub.add_parser("latest", help="各商品各门店的最新价格")
+    p.add_argument("--item")
+    p.add_argument("--store")
+    p = sub.add_parser("series", help="某个商品的价格时间序列")
+    p.add_argument("item")
+    p.add_argument("--store")
+    p.add_argument("--branch")
+    p.add_argument("--since", help="起始日期 / 时间（ISO，含）")
+    p.add_argument("--until", help="截止日期 / 时间（ISO，不含）")
+    p = sub.add_parser("cheapest", help="每个商品当前最便宜的门店")
+    p.add_argument("--store", help="只看这家店最便宜的商品")
+    sub.add_parser("items", help="商品概览")
+    p = sub.add_parser("serve", help="启动本地 HTTP 查询服务")
+    p.add_argument("--host", default=HOST)
+    p.add_argument("--port", type=int, default=PORT)
+    for name in ENDPOINTS:
+        sub.choices[name].add_argument("--csv", action="store_true", help="输出 CSV（默认 NDJSON）")
+    args = vars(ap.parse_args(argv))
+
+    endpoint = args.pop("endpoint")
+    if endpoint == "serve":
+        return serve(args["host"], args["port"])
+    fmt    = "csv" if args.pop("csv") else "ndjson"
+    params = {k: v for k, v in args.items() if v is not None}
+    try:
+        with closing(query.connect()) as conn:
+            for line in encode(run(conn, endpoint, params), fmt):
+                sys.stdout.write(line)
+    except (QueryError, FileNotFoundError) as e:
+        print(e, file=sys.stderr)
+        raise SystemExit(1)
+    except BrokenPipeError:
+        sys.stderr.close()   # 下游（head 等）提前关闭
+
+
+if __name__ == "__main__":
+    main()
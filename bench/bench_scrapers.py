@@ -0,0 +1,195 @@
+"""
+爬虫基准 — 对本地替身服务器（bench/standin.py）计时
+
+两部分：
+  1. 单策略：Woolworths 批量 / JSON API / &q; HTML / __NEXT_DATA__，
+     Coles 搜索 / 按 ID / URL 发现，ALDI new / old / generic 及缓存命中后的查询，
+     每个策略报告延迟分位数和吞吐
+  2. 端到端：合成 10 / 100 / 1000 项 watchlist 跑 monitor.main，
+     每个规模一个独立子进程，报告耗时、吞吐、请求数和峰值 RSS
+
+用法（仓库根目录）：
+    python -m bench.bench_scrapers [--calls 50] [--sizes 10,100,1000] [--json out.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.standin import Server, redirect
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[k]
+
+
+def synthetic_watchlist(n: int) -> list[dict]:
+    return [
+        {
+            "name":            f"Bench Item {i}",
+            "woolworths_id":   str(100000 + i),
+            "coles_query":     f"item {i} bench",
+            "monitor_aldi":    True,
+            "aldi_keyword":    f"milk item{i}",
+            "alert_threshold": 0.10,
+        }
+        for i in range(n)
+    ]
+
+
+# ── 1. 单策略 ─────────────────────────────────────────────────────────────────
+
+def strategy_cases(url: str):
+    from scraper import aldi, coles, woolworths
+    ww = woolworths.DEFAULT_BRANCH
+
+    def aldi_fresh(i):
+        aldi._pages.clear()
+        return aldi.get_price(f"milk item{i}")
+
+    # (名称, {替身模式}, 调用, 期望的 source)
+    return [
+        ("ww.bulk",         {"ww": "bulk"},         lambda i: woolworths._try_bulk([str(100000 + i)], ww).get(str(100000 + i)), "bulk_api"),
+        ("ww.json_api",     {"ww": "json_api"},     lambda i: woolworths._try_api(str(100000 + i), ww),   "json_api"),
+        ("ww.html_encoded", {"ww": "html_encoded"}, lambda i: woolworths._try_html(str(100000 + i), ww),  "html_encoded"),
+        ("ww.next_data",    {"ww": "next_data"},    lambda i: woolworths._try_html(str(100000 + i), ww),  "next_data"),
+        ("coles.search",    {},                     lambda i: coles._search(url, f"item {i}", coles.DEFAULT_BRANCH.id), None),
+        ("coles.by_id",     {},                     lambda i: coles._fetch_by_ids(url, [str(5000000 + i)], coles.DEFAULT_BRANCH.id) or None, None),
+        ("coles.discover",  {},                     lambda i: coles._discover(),                          None),
+        ("aldi.new",        {"aldi": "new"},        aldi_fresh,                                           "new"),
+        ("aldi.old",        {"aldi": "old"},        aldi_fresh,                                           "old"),
+        ("aldi.generic",    {"aldi": "generic"},    aldi_fresh,                                           "generic"),
+        ("aldi.cached",     {"aldi": "new"},        lambda i: aldi.get_price(f"milk item{i}"),            "new"),
+    ]
+
+
+def time_strategies(server: Server, calls: int) -> list[dict]:
+    from scraper import aldi, conditional
+
+    rows = []
+    for name, mode, fn, source in strategy_cases(server.url):
+        server.mode.update(mode)
+        aldi._pages.clear()
+        latencies, before = [], server.requests
+        for i in range(calls):
+            # 每次都清空条件请求缓存，测的是完整下载 + 解析
+            conditional._store = {}
+            conditional._seen.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                t = time.perf_counter()
+                result = fn(i)
+                latencies.append(time.perf_counter() - t)
+            if result is None or (source and result.get("source") != source):
+                raise RuntimeError(f"{name}: 第 {i} 次调用结果不符合预期: {result!r}")
+        latencies.sort()
+        total = sum(latencies)
+        rows.append({
+            "strategy": name,
+            "calls":    calls,
+            "requests": server.requests - before,
+            "p50_ms":   percentile(latencies, 50) * 1000,
+            "p90_ms":   percentile(latencies, 90) * 1000,
+            "p99_ms":   percentile(latencies, 99) * 1000,
+            "per_s":    calls / total if total else 0.0,
+        })
+    server.mode.update({"ww": "bulk", "aldi": "new"})
+    return rows
+
+
+# ── 2. 端到端（子进程） ───────────────────────────────────────────────────────
+
+def run_child(n: int, url: str, out: Path):
+    """在当前工作目录（临时目录）里用合成 watchlist 跑一次 monitor.main"""
+    Path("watchlist.json").write_text(json.dumps(synthetic_watchlist(n)), encoding="utf-8")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench")
+    os.environ.setdefault("TELEGRAM_CHAT_ID", "bench")
+    redirect(url)
+    import monitor
+
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        monitor.main()
+    elapsed = time.perf_counter() - t
+    out.write_text(json.dumps({
+        "items":       n,
+        "seconds":     elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def time_end_to_end(server: Server, sizes: list[int]) -> list[dict]:
+    rows = []
+    for n in sizes:
+        server.aldi_tiles = min(n, 1000)
+        server._aldi.clear()
+        with tempfile.TemporaryDirectory() as tmp:
+            out, before = Path(tmp) / "result.json", server.requests
+            subprocess.run(
+                [sys.executable, "-m", "bench.bench_scrapers",
+                 "--child", str(n), "--url", server.url, "--out", str(out)],
+                cwd=tmp, check=True,
+                env={**os.environ, "PYTHONPATH": str(ROOT)},
+            )
+            row = json.loads(out.read_text())
+        row["requests"]    = server.requests - before
+        row["items_per_s"] = n / row["seconds"] if row["seconds"] else 0.0
+        rows.append(row)
+    return rows
+
+
+# ── 报告 ──────────────────────────────────────────────────────────────────────
+
+def print_report(strategies: list[dict], e2e: list[dict]):
+    print(f"{'策略':<18}{'调用':>6}{'请求':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'次/秒':>10}")
+    for r in strategies:
+        print(f"{r['strategy']:<18}{r['calls']:>6}{r['requests']:>6}"
+              f"{r['p50_ms']:>10.2f}{r['p90_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['per_s']:>10.1f}")
+    print()
+    print(f"{'watchlist':>10}{'耗时 s':>10}{'项/秒':>10}{'请求':>8}{'峰值 RSS MB':>14}")
+    for r in e2e:
+        print(f"{r['items']:>10}{r['seconds']:>10.2f}{r['items_per_s']:>10.1f}"
+              f"{r['requests']:>8}{r['peak_rss_mb']:>14.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--calls", type=int, default=50, help="每个策略的调用次数")
+    ap.add_argument("--sizes", default="10,100,1000", help="端到端 watchlist 规模，逗号分隔")
+    ap.add_argument("--json", help="另存机器可读结果")
+    ap.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--url", help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child is not None:
+        return run_child(args.child, args.url, Path(args.out))
+
+    server = Server().start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            redirect(server.url)
+            strategies = time_strategies(server, args.calls)
+            os.chdir(ROOT)
+        e2e = time_end_to_end(server, [int(s) for s in args.sizes.split(",") if s])
+    finally:
+        server.stop()
+    print_report(strategies, e2e)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"strategies": strategies, "end_to_end": e2e}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+快照基准 — dict 记录 + JSON 与 Record + 二进制格式的内存和读写耗时
+
+合成一份 N 个商品 × 3 家零售商 × B 个分店的扁平快照，报告：
+  mem_kb    tracemalloc 统计的快照内存（含键元组）
+  save_ms   序列化耗时（JSON 为旧版 indent=2 格式）
+  load_ms   反序列化耗时
+  size_kb   序列化后的字节数
+
+用法（仓库根目录）：
+    python -m bench.bench_snapshot [--items 5000] [--branches 4] [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from scraper import records
+from scraper.records import Record
+
+STORES = {"Woolworths": "bulk_api", "Coles": "api_id", "ALDI": "new"}
+
+
+def make(items: int, branches: int, compact: bool) -> dict:
+    snapshot = {}
+    for i in range(items):
+        for store, source in STORES.items():
+            for b in range(branches):
+                r = Record(store, f"Branch {b}", f"Product {i} 500g", 1 + i % 97 / 10,
+                           (2 + i % 97 / 10) if i % 5 == 0 else None,
+                           f"${i % 9 / 10 + 0.1:.2f} / 100G" if store != "ALDI" else "",
+                           i % 5 == 0, source)
+                snapshot[(f"Item {i}", store, f"Branch {b}")] = r if compact else dict(r)
+    return snapshot
+
+
+def measure(items: int, branches: int, compact: bool, runs: int) -> dict:
+    tracemalloc.start()
+    snapshot = make(items, branches, compact)
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    if compact:
+        save = lambda: records.dumps(snapshot)
+        load = records.loads
+    else:
+        nested = {}
+        for (item, store, branch), r in snapshot.items():
+            nested.setdefault(item, {})[f"{store} {branch}"] = r
+        save = lambda: json.dumps(nested, indent=2, ensure_ascii=False).encode("utf-8")
+        load = json.loads
+
+    saves, loads = [], []
+    for _ in range(runs):
+        t = time.perf_counter(); data = save(); saves.append(time.perf_counter() - t)
+        t = time.perf_counter(); load(data); loads.append(time.perf_counter() - t)
+    return {
+        "records": len(snapshot),
+        "mem_kb":  round(mem / 1024),
+        "save_ms": round(statistics.median(saves) * 1000, 1),
+        "load_ms": round(statistics.median(loads) * 1000, 1),
+        "size_kb": round(len(data) / 1024),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=5000)
+    ap.add_argument("--branches", type=int, default=4)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    print(f"{'':<16}{'records':>9}{'mem_kb':>9}{'save_ms':>9}{'load_ms':>9}{'size_kb':>9}")
+    for label, compact in (("dict + json", False), ("Record + bin", True)):
+        m = measure(args.items, args.branches, compact, args.runs)
+        print(f"{label:<16}" + "".join(f"{v:>9}" for v in m.values()))
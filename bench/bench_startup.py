@@ -0,0 +1,106 @@
+"""
+启动基准 — 冷启动 import 开销
+
+每个场景一个全新的 python -X importtime 子进程，报告：
+  wall_ms   子进程从启动到退出的总耗时（取 --runs 次中位数）
+  import_ms importtime 统计的所有顶层 import 累计耗时
+  以及该场景里累计耗时最大的几个模块
+
+场景：
+  monitor         只 import monitor（CLI 解析参数、--help 之类）
+  woolworths      import monitor 后加载一家店的后端（单店运行）
+  all_stores      三家店后端全部加载
+  session         再创建一个 cloudscraper 会话（首个请求前的固定开销）
+
+用法（仓库根目录）：
+    python -m bench.bench_startup [--runs 5] [--top 8] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# -X importtime 只统计 import 语句，不统计 importlib.import_module，
+# 所以这里直接 import 注册表按需加载的那些后端模块
+SCENARIOS = {
+    "monitor":    "import monitor",
+    "woolworths": "import monitor; import scraper.woolworths",
+    "all_stores": "import monitor; import scraper.woolworths, scraper.coles, scraper.aldi",
+    "session":    "import monitor; import scraper.woolworths, scraper.coles, scraper.aldi; "
+                  "from scraper import sessions; sessions.get('Woolworths')",
+}
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """importtime 输出 → [(模块, 自身 µs, 累计 µs)]，保持原顺序"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name[1:].rstrip(), int(self_us), int(cum_us)))   # 保留缩进：无缩进的是顶层 import
+    return rows
+
+
+def run_once(code: str) -> tuple[float, list[tuple[str, int, int]]]:
+    t = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+    )
+    return time.perf_counter() - t, parse_importtime(proc.stderr)
+
+
+def measure(name: str, code: str, runs: int, top: int) -> dict:
+    walls, imports, last = [], [], []
+    for _ in range(runs):
+        wall, rows = run_once(code)
+        walls.append(wall)
+        # 顶层 import（名字不带缩进）的累计时间之和即总 import 耗时
+        imports.append(sum(cum for mod, _, cum in rows if not mod.startswith(" ")))
+        last = rows
+    heaviest = sorted(
+        ((mod.strip(), cum) for mod, _, cum in last if not mod.startswith(" ")),
+        key=lambda r: r[1], reverse=True,
+    )[:top]
+    return {
+        "scenario":  name,
+        "wall_ms":   statistics.median(walls) * 1000,
+        "import_ms": statistics.median(imports) / 1000,
+        "modules":   len(last),
+        "heaviest":  [{"module": m, "ms": us / 1000} for m, us in heaviest],
+    }
+
+
+def print_report(rows: list[dict]):
+    print(f"{'场景':<14}{'wall ms':>10}{'import ms':>12}{'模块数':>8}")
+    for r in rows:
+        print(f"{r['scenario']:<14}{r['wall_ms']:>10.1f}{r['import_ms']:>12.1f}{r['modules']:>8}")
+    for r in rows:
+        print(f"\n{r['scenario']} 最重的顶层 import：")
+        for h in r["heaviest"]:
+            print(f"    {h['module']:<40}{h['ms']:>8.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--runs", type=int, default=5, help="每个场景的子进程次数（取中位数）")
+    ap.add_argument("--top", type=int, default=8, help="每个场景列出最重的几个 import")
+    ap.add_argument("--json", help="另存机器可读结果")
+    args = ap.parse_args()
+
+    rows = [measure(name, code, args.runs, args.top) for name, code in SCENARIOS.items()]
+    print_report(rows)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
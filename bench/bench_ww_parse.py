@@ -0,0 +1,119 @@
+"""
+Woolworths HTML 解析微基准
+
+用 bench/fixtures 里保存的商品页，把两种 HTML 降级解析（&q; 编码 JSON、
+__NEXT_DATA__）的旧实现和当前实现放在一起比较：每页 CPU 时间和峰值内存。
+真实商品页有几百 KB，夹具里的 <!--PAD--> 和 "menu":[] 会按 --size 展开成等量的
+无关标记，让商品数据埋在页面中间。
+
+用法（仓库根目录）：
+    python -m bench.bench_ww_parse [--size 400] [--repeat 200]
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from scraper import woolworths
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+# ── 旧实现（整页 replace + 未编译正则 + 整块 json.loads），作为对照 ───────────
+
+def _legacy_rx(pattern, text, default=None):
+    m = re.search(pattern, text)
+    return m.group(1) if m else default
+
+
+def legacy_parse_encoded(html, pid):
+    c = html.replace("&q;", '"').replace("&amp;", "&")
+    pm = re.search(r'"Price"\s*:\s*([\d.]+)', c)
+    if not pm:
+        return None
+    return woolworths._build(
+        name=_legacy_rx(r'"Name"\s*:\s*"([^"]{3,100})"', c, f"WW-{pid}"),
+        price=float(pm.group(1)),
+        was=float(_legacy_rx(r'"WasPrice"\s*:\s*([\d.]+)', c) or 0) or None,
+        special=_legacy_rx(r'"IsOnSpecial"\s*:\s*(true|false)', c) == "true",
+        cup=_legacy_rx(r'"CupString"\s*:\s*"([^"]*)"', c, ""),
+        src="html_encoded",
+    )
+
+
+def legacy_parse_next_data(html, pid):
+    m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.+?)</script>', html, re.DOTALL)
+    if not m:
+        return None
+    data = json.loads(m.group(1))
+    props = data.get("props", {}).get("pageProps", {})
+    p = props.get("product") or props.get("initialData", {}).get("product")
+    price = p.get("price") or p.get("Price")
+    return woolworths._build(
+        name=p.get("name") or p.get("Name", f"WW-{pid}"),
+        price=float(price),
+        was=p.get("wasPrice") or p.get("WasPrice"),
+        special=bool(p.get("isOnSpecial") or p.get("IsOnSpecial")),
+        cup="",
+        src="next_data",
+    )
+
+
+# ── 夹具 ──────────────────────────────────────────────────────────────────────
+
+def load_fixture(name: str, size_kb: int) -> str:
+    html   = (FIXTURES / name).read_text(encoding="utf-8")
+    budget = size_kb * 1024
+    if '"menu":[]' in html:
+        # 一半预算给 __NEXT_DATA__ 里的菜单，一半给页面标记
+        budget //= 2
+        menu = json.dumps([{"label": f"Category {i}", "url": f"/shop/browse/c{i}"}
+                           for i in range(budget // 50)])
+        html = html.replace('"menu":[]', f'"menu":{menu}')
+    filler = '<div class="tile"><a href="/shop/browse/x">Browse &amp; save</a></div>\n'
+    pads   = max(html.count("<!--PAD-->"), 1)
+    return html.replace("<!--PAD-->", filler * (budget // len(filler) // pads))
+
+
+# ── 测量 ──────────────────────────────────────────────────────────────────────
+
+def measure(fn, html: str, repeat: int) -> tuple[float, int]:
+    """(每页中位耗时 ms, 峰值内存 KB)"""
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(html, "165367")
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    fn(html, "165367")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times) * 1000, peak // 1024
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--size", type=int, default=400, help="展开后的页面大小（KB）")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    cases = [
+        ("html_encoded", "woolworths_encoded.html",
+         legacy_parse_encoded, woolworths._parse_encoded),
+        ("next_data", "woolworths_next_data.html",
+         legacy_parse_next_data, woolworths._parse_next_data),
+    ]
+    print(f"{'解析':<14}{'页面KB':>8}{'旧 ms':>10}{'新 ms':>10}{'旧 峰值KB':>12}{'新 峰值KB':>12}")
+    for label, fixture, old, new in cases:
+        html = load_fixture(fixture, args.size)
+        assert old(html, "165367") == new(html, "165367"), f"{label}: 新旧结果不一致"
+        old_ms, old_kb = measure(old, html, args.repeat)
+        new_ms, new_kb = measure(new, html, args.repeat)
+        print(f"{label:<14}{len(html) // 1024:>8}{old_ms:>10.3f}{new_ms:>10.3f}{old_kb:>12}{new_kb:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+本地替身服务器 — 回放 bench/fixtures 里录下的响应
+
+一个 ThreadingHTTPServer 同时扮演 Woolworths、Coles、ALDI 和 Telegram：
+任意 stockcode / 查询词 / 关键词都能应答，价格由商品编号确定性地算出，
+所以 10 / 100 / 1000 项的合成 watchlist 都能完整跑通。
+
+Server.mode 控制各家走哪条降级路径，用来单独计时每个策略：
+    ww:    "bulk" | "json_api" | "html_encoded" | "next_data"
+    aldi:  "new"  | "old"      | "generic"
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+_TILE_RE = re.compile(r"<!--TILE-->(.*?)<!--/TILE-->", re.S)
+
+
+def _fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def item_price(n: int) -> float:
+    return round(1.0 + (n * 37 % 900) / 100, 2)
+
+
+def item_number(text: str) -> int:
+    m = re.search(r"(\d+)", text)
+    return int(m.group(1)) if m else 0
+
+
+class Server:
+    def __init__(self, aldi_tiles: int = 200):
+        self.mode       = {"ww": "bulk", "aldi": "new"}
+        self.aldi_tiles = aldi_tiles
+        self.requests   = 0
+        self._ww        = json.loads(_fixture("woolworths_product.json"))["Product"]
+        self._coles     = json.loads(_fixture("coles_product.json"))
+        self._aldi      = {}
+        self._httpd     = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self) -> "Server":
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+
+    # ── 各家响应 ─────────────────────────────────────────────────────────────
+
+    def ww_product(self, code: str) -> dict:
+        n = item_number(code)
+        return {**self._ww, "Stockcode": int(code) if code.isdigit() else code,
+                "Name": f"Bench Product {n}", "Price": item_price(n),
+                "WasPrice": item_price(n) + 0.5, "IsOnSpecial": n % 3 == 0}
+
+    def ww_html(self, code: str) -> str:
+        p = self.ww_product(code)
+        if self.mode["ww"] == "next_data":
+            html = _fixture("woolworths_next_data.html")
+            return (html.replace('"name":"Woolworths Free Range Eggs 12 Pack"', f'"name":"{p["Name"]}"')
+                        .replace('"price":5.8', f'"price":{p["Price"]}'))
+        html = _fixture("woolworths_encoded.html")
+        return (html.replace("&q;Name&q;:&q;Woolworths Free Range Eggs 12 Pack&q;",
+                             f"&q;Name&q;:&q;{p['Name']}&q;")
+                    .replace("&q;Price&q;:5.8", f"&q;Price&q;:{p['Price']}"))
+
+    def coles_item(self, query: str) -> dict:
+        n = item_number(query)
+        return {**self._coles, "id": 5000000 + n, "name": f"Bench Coles {n}",
+                "pricing": {**self._coles["pricing"], "now": item_price(n)}}
+
+    def aldi_page(self, variant: str) -> str:
+        if variant not in self._aldi:
+            html = _fixture(f"aldi_{variant}.html")
+            tile = _TILE_RE.search(html).group(1)
+            tiles = "".join(
+                tile.replace("{slug}", f"item{i}")
+                    .replace("{name}", f"Farmdale Milk Item{i} 2L")
+                    .replace("{price}", f"{item_price(i):.2f}")
+                for i in range(self.aldi_tiles)
+            )
+            self._aldi[variant] = _TILE_RE.sub(lambda _: tiles, html)
+        return self._aldi[variant]
+
+    # ── 路由 ─────────────────────────────────────────────────────────────────
+
+    def route(self, method: str, path: str, query: dict) -> tuple[int, str, str]:
+        self.requests += 1
+        q = {k: v[0] for k, v in query.items()}
+        ww = self.mode["ww"]
+        if path.startswith("/apis/ui/products/"):
+            if ww != "bulk":
+                return 404, "application/json", "{}"
+            codes = path.rsplit("/", 1)[1].split(",")
+            return 200, "application/json", json.dumps([self.ww_product(c) for c in codes])
+        if path.startswith("/apis/ui/product/detail/"):
+            if ww not in ("bulk", "json_api"):
+                return 403, "application/json", "{}"
+            return 200, "application/json", json.dumps({"Product": self.ww_product(path.rsplit("/", 1)[1])})
+        if path.startswith("/shop/productdetails/"):
+            return 200, "text/html", self.ww_html(path.rsplit("/", 1)[1])
+        if path == "/api/2.0/market/products":
+            if "productIds" in q:
+                items = [self.coles_item(str(int(i) - 5000000)) for i in q["productIds"].split(",")]
+            else:
+                items = [self.coles_item(q.get("q", ""))]
+            return 200, "application/json", json.dumps({"results": items})
+        if path == "/search":
+            return 200, "text/html", _fixture("coles_search_page.html")
+        if path.startswith("/en/groceries/"):
+            return 200, "text/html", self.aldi_page(self.mode["aldi"])
+        if path.endswith("/sendMessage"):
+            return 200, "application/json", '{"ok":true,"result":{}}'
+        return 404, "text/plain", "not found"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                parts = urlsplit(self.path)
+                if self.command == "POST":
+                    self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, ctype, body = server.route(self.command, parts.path, parse_qs(parts.query))
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def redirect(url: str):
+    """把三家 scraper 和 Telegram 通知的上游地址都指向替身服务器，关掉礼貌间隔和跨运行缓存"""
+    from scraper import aldi, cache, coles, notify, throttle, woolworths
+
+    woolworths.BASE_URL = url
+    coles.SITE_URL      = url
+    coles.CACHE_FILE.parent.mkdir(exist_ok=True)
+    coles.CACHE_FILE.write_text(url)
+    for key, u in aldi.CATEGORY_URLS.items():
+        aldi.CATEGORY_URLS[key] = url + urlsplit(u).path
+    notify.API_URL = url
+    for store in throttle.LIMITS:
+        throttle.configure(store, 0, 0)
+    cache.disable()
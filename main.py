@@ -4,6 +4,7 @@ from datetime import datetime
 from telegram import Bot
 
 from crawler.woolworths import get_woolworths_deals
+from scraper.changes import ChangeDetector
 
 BOT_TOKEN = os.environ["BOT_TOKEN"]
 CHAT_ID = os.environ["CHAT_ID"]
@@ -11,6 +12,7 @@ CHAT_ID = os.environ["CHAT_ID"]
 bot = Bot(token=BOT_TOKEN)
 
 DATA_FILE = "storage/data.json"
+STORE = "Woolworths"
 
 
 def load_db():
@@ -27,31 +29,37 @@ def save_db(data):
         json.dump(data, f)
 
 
-def detect_price_drop(new_data, old_data, threshold=0.2):
-    alerts = []
-
-    for product, price in new_data.items():
-
+def parse_prices(data):
+    """{商品: "$2.90"} → {商品: 2.9}，无法解析的价格直接跳过"""
+    prices = {}
+    for product, price in data.items():
         try:
-            price_float = float(price.replace("$", ""))
+            prices[product] = float(str(price).replace("$", "").replace(",", ""))
+        except ValueError:
+            continue
+    return prices
 
-            if product in old_data:
-                old_price = float(old_data[product].replace("$", ""))
 
-                if old_price > price_float * (1 + threshold):
-                    alerts.append(
-                        f"⬇️ 降价 {product}\n"
-                        f"原价 ${old_price}\n"
-                        f"现价 ${price_float}"
-                    )
+def detect_price_drop(new_data, old_data, threshold=0.2):
+    """与 monitor.py 共用增量变动引擎；返回结构化的 Alert 列表"""
+    detector = ChangeDetector(default=0.01, new_items=True)
+    detector.seed({p: {STORE: {"price": v}} for p, v in parse_prices(old_data).items()})
 
-            else:
-                alerts.append(f"🆕 新商品 {product} - ${price_float}")
+    new_prices = parse_prices(new_data)
+    return [
+        a for a in detector.feed((p, STORE, {"price": v}) for p, v in new_prices.items())
+        if a.kind == "new" or a.old_price > a.new_price * (1 + threshold)
+    ]
 
-        except:
-            continue
 
-    return alerts
+def format_alert(a):
+    if a.kind == "new":
+        return f"🆕 新商品 {a.item} - ${a.new_price}"
+    return (
+        f"⬇️ 降价 {a.item}\n"
+        f"原价 ${a.old_price}\n"
+        f"现价 ${a.new_price}"
+    )
 
 
 def main():
@@ -64,7 +72,7 @@ def main():
 
     if alerts:
         message = "🛒 Carnegie 超市特价监控\n\n"
-        message += "\n\n".join(alerts)
+        message += "\n\n".join(format_alert(a) for a in alerts)
         message += f"\n\n更新时间 {datetime.now()}"
 
         bot.send_message(chat_id=CHAT_ID, text=message)
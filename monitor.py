@@ -1,87 +1,145 @@
 #!/usr/bin/env python3
-"""Carnegie 3163 超市价格监控"""
-import json, time, random
-from datetime import datetime
+"""Carnegie 3163 超市价格监控（单次运行；常驻模式见 poller.py）"""
+from contextlib import closing
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from scraper.woolworths import get_price as ww_get
-from scraper.coles      import get_price as coles_get
-from scraper.aldi       import get_price as aldi_get
-from scraper.notify     import send, price_change_message, daily_summary_message
+from scraper            import branches, cache, conditional, fanout, metrics, records, watchlist
+from scraper.changes    import BaselineDetector, ChangeDetector, observations
+from scraper.notify     import Outbox, price_change_message, daily_summary_message
+from scraper.watchlist  import WatchlistError
+from storage            import baselines, history
+import scheduler
 
 WATCHLIST_FILE = Path("watchlist.json")
-PRICES_FILE    = Path("data/prices.json")
 
-def load_watchlist(): return json.loads(WATCHLIST_FILE.read_text(encoding="utf-8"))
+def load_watchlist(): return watchlist.load(WATCHLIST_FILE)   # 编译好的 [watchlist.Item]
 def load_prices():
-    return json.loads(PRICES_FILE.read_text(encoding="utf-8")) if PRICES_FILE.exists() else {}
-def save_prices(p):
-    PRICES_FILE.parent.mkdir(exist_ok=True)
-    PRICES_FILE.write_text(json.dumps(p, indent=2, ensure_ascii=False), encoding="utf-8")
-
-def fetch_prices(watchlist):
-    snapshot = {}
-    for item in watchlist:
-        name, stores = item["name"], {}
-        print(f"\n  → {name}")
-        if ww_id := item.get("woolworths_id"):
-            r = ww_get(ww_id)
-            if r:
-                stores["Woolworths"] = r
-                print(f"    WW:    ${r['price']:.2f}{'🏷️' if r.get('on_special') else ''}  ({r['source']})")
-            else: print("    WW:    ❌ 无法获取")
-            time.sleep(random.uniform(1.0, 2.5))
-        if q := item.get("coles_query"):
-            r = coles_get(q)
-            if r:
-                stores["Coles"] = r
-                print(f"    Coles: ${r['price']:.2f}{'🏷️' if r.get('on_special') else ''}  ({r['source']})")
-            else: print("    Coles: ❌ 无法获取")
-            time.sleep(random.uniform(1.0, 2.5))
-        if item.get("monitor_aldi") and (kw := item.get("aldi_keyword")):
-            r = aldi_get(kw)
-            if r:
-                stores["ALDI"] = r
-                print(f"    ALDI:  ${r['price']:.2f}")
-            else: print("    ALDI:  ❌ 无法获取")
-            time.sleep(random.uniform(0.5, 1.5))
-        snapshot[name] = stores
+    with closing(history.connect()) as conn:
+        return history.latest(conn)
+def save_prices(p, ts=None):
+    with closing(history.connect()) as conn:
+        history.append(conn, p, ts)
+def load_branch_prices():
+    with closing(history.connect()) as conn:
+        return history.latest_branches(conn)
+def save_branch_prices(p, ts=None):
+    with closing(history.connect()) as conn:
+        history.append_stream(conn, fanout.observations(p), ts)
+
+# ── 并发抓取：每家零售商一条独立通道（scraper.fanout） ─────────────────────
+# 限速在 scraper.throttle 里按门店进行，各通道并行，
+# 总耗时取决于最慢的那家店，而不是几家之和。
+# 后端经 scraper.registry 按需加载，watchlist 里没有的门店不会被 import。
+
+def fetch_prices(watchlist, on_store=None, plan=None):
+    """
+    每家零售商只抓默认分店，返回 {item: {store: record}}。
+    on_store(store, {item: record})：某家店整条通道跑完时立即回调（在调用线程里），
+    不必等其他门店。
+    plan：{门店: watchlist 序号集合}，只抓选中的 (商品, 门店)（见 adaptive_plan）。
+    """
+    snapshot = fanout.fan_out(watchlist, branches.defaults(), on_store, plan)
+    conditional.save()
+    return fanout.nest(snapshot, items=[i.name for i in watchlist])
+
+def fetch_branches(watchlist, branch_map, on_branch=None, plan=None):
+    """多分店扇出，返回扁平快照 {(item, store, branch): record}"""
+    snapshot = fanout.fan_out(watchlist, branch_map, on_branch, plan)
+    conditional.save()
     return snapshot
 
+def alert_thresholds(watchlist):
+    return {i.name: i.below_pct for i in watchlist}
+
+def build_detector(watchlist):
+    """按历史基线提醒（scraper.changes.BaselineDetector），基线从 history.db 载入"""
+    detector = BaselineDetector(alert_thresholds(watchlist))
+    with closing(history.connect()) as conn:
+        baselines.load(conn, detector)
+    return detector
+
+def save_baselines(detector):
+    with closing(history.connect()) as conn:
+        baselines.save(conn, detector)
+
+def adaptive_plan(watchlist, budget, max_staleness):
+    """按价格历史估计的变价概率，给每家店挑出本次要抓的商品"""
+    with closing(history.connect()) as conn:
+        stats = scheduler.load_stats(conn)
+    lanes = {b.store: [(i, watchlist[i].name) for i, _ in jobs]
+             for b, jobs in fanout.lanes(watchlist)}
+    chosen = scheduler.plan(lanes, stats, budget, max_staleness)
+    for store, items in lanes.items():
+        print(f"  自适应轮询 {store}: {len(chosen[store])}/{len(items)}")
+    return chosen
+
+def alert_sink(detector, outbox, alerts):
+    """fetch_prices / fetch_branches 的回调：这家店（分店）抓完就比对、就发，其他门店还在抓"""
+    def on_store(store, records):
+        found = list(detector.feed((name, store, r) for name, r in records.items()))
+        if found:
+            print(f"\n  {store}: {len(found)} 条价格提醒，发送 Telegram 通知…")
+            outbox.put(price_change_message(found))
+        alerts.extend(found)
+    return on_store
+
+def summary_insights():
+    """日报附带的历史分析（analytics 依赖 NumPy，只在发日报时才加载）"""
+    import analytics
+    with closing(history.connect()) as conn:
+        return analytics.insights(conn)
+
 def detect_changes(old, new, watchlist):
-    thresholds = {i["name"]: i.get("alert_threshold", 0.10) for i in watchlist}
-    alerts = []
-    for name, stores in new.items():
-        for store, data in stores.items():
-            np = data.get("price"); op = old.get(name, {}).get(store, {}).get("price")
-            if np is None or op is None: continue
-            change = round(np - op, 2)
-            if abs(change) >= thresholds.get(name, 0.10):
-                alerts.append({"item": name, "store": store, "branch": data.get("branch",""),
-                                "old_price": op, "new_price": np, "change": change,
-                                "on_special": data.get("on_special", False)})
-    return alerts
-
-def main():
+    """只和上一次价格比较的简单变动检测"""
+    detector = ChangeDetector({i.name: i.threshold for i in watchlist})
+    detector.seed(old)
+    return list(detector.feed(observations(new)))
+
+def main(budget=None, max_staleness=timedelta(hours=72)):
+    """budget：每家店本次最多抓几个商品（自适应轮询）；None 表示全部抓"""
     now = datetime.now()
     print(f"[{now:%Y-%m-%d %H:%M} AEDT] Carnegie 3163 价格监控启动")
     print("门店: Woolworths Carnegie North #3298 | Coles Carnegie Central | ALDI Carnegie")
     print("─" * 60)
-    watchlist  = load_watchlist()
-    old_prices = load_prices()
+    try:
+        watchlist = load_watchlist()
+    except WatchlistError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    branch_map = branches.load()
+    multi      = any(len(v) > 1 for v in branch_map.values())
+    detector   = build_detector(watchlist)
+    outbox     = Outbox()
+    alerts     = []
+
+    plan = adaptive_plan(watchlist, budget, max_staleness) if budget is not None else None
     print("\n正在获取价格…")
-    new_prices = fetch_prices(watchlist)
+    new_prices = fetch_branches(watchlist, branch_map, alert_sink(detector, outbox, alerts), plan)
     print("\n" + "─" * 60)
-    alerts = detect_changes(old_prices, new_prices, watchlist)
-    if alerts:
-        print(f"检测到 {len(alerts)} 条价格变动，发送 Telegram 通知…")
-        send(price_change_message(alerts))
-    else:
-        print("无价格变动")
+    if not alerts:
+        print("无价格提醒")
+    save_branch_prices(new_prices, now.isoformat(timespec="seconds"))
+    save_baselines(detector)
     if now.hour == 8:
-        send(daily_summary_message(new_prices))
-    save_prices(new_prices)
+        # 自适应轮询只抓了一部分，日报用合并后的最新价；多分店时每个分店单独一列
+        latest = new_prices if plan is None else load_branch_prices()
+        outbox.put(daily_summary_message(fanout.nest(latest, by_branch=multi, items=[i.name for i in watchlist]), summary_insights()))
+    outbox.close()
+    metrics.write()
     print("✅ 完成！")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    ap = argparse.ArgumentParser(description="Carnegie 3163 超市价格监控")
+    ap.add_argument("--budget", type=int, help="自适应轮询：每家店本次最多抓几个商品")
+    ap.add_argument("--max-staleness", type=float, default=72, help="自适应轮询：任何商品最多隔几小时必抓一次")
+    ap.add_argument("--no-cache", action="store_true", help="绕过跨运行的 HTTP 响应缓存（也可设 HTTP_CACHE=off）")
+    ap.add_argument("--export-json", metavar="PATH", help="把各商品最新价格导出为旧版 prices.json 格式后退出")
+    args = ap.parse_args()
+    if args.no_cache:
+        cache.disable()
+    if args.export_json:
+        Path(args.export_json).write_text(records.to_json(load_prices()), encoding="utf-8")
+    else:
+        main(args.budget, timedelta(hours=args.max_staleness))
@@ -0,0 +1,158 @@
+"""
+常驻模式 — python poller.py [--interval 360] [--hot-interval 60]
+
+一次启动后一直运行：cloudscraper 会话、Cloudflare 握手、Coles URL 缓存、
+价格基线都留在内存里，不再每次冷启动。
+每个商品有自己的下次轮询时间：
+  - 有门店正在特价，或上次价格变动已接近 alert_threshold 的商品，用 hot_interval
+  - 其余用 interval；watchlist 里写 poll_minutes 可单独覆盖
+调度状态存到 data/daemon_state.json，重启后只抓已经到期的商品。
+"""
+import json
+import signal
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import monitor
+from scraper import breaker, cache, metrics, registry
+from scraper.notify import Outbox, daily_summary_message
+from scraper.watchlist import Item, WatchlistError
+
+STATE_FILE    = Path("data/daemon_state.json")
+MAX_SLEEP     = 60     # 最长睡眠（秒），保证 watchlist 改动能及时生效
+HOT_FRACTION  = 0.5    # 变动达到阈值的这一比例即视为"临近阈值"
+SUMMARY_HOUR  = 8
+
+
+class Poller:
+    def __init__(self, interval: float, hot_interval: float):
+        self.interval     = interval
+        self.hot_interval = hot_interval
+        self.state        = _load_state()
+        self.snapshot     = monitor.load_prices()
+        self.detector     = monitor.build_detector([])
+        self.outbox       = Outbox()
+        self.watchlist    = []
+        self._mtime       = None
+
+    # ── 调度 ─────────────────────────────────────────────────────────────────
+
+    def tick(self):
+        """抓取所有已到期的商品；没有到期的就什么也不做"""
+        self._reload_watchlist()
+        now = time.time()
+        due = [it for it in self.watchlist if self._next_due(it.name) <= now]
+        if due:
+            self._poll(due)
+        self._daily_summary()
+        _save_state(self.state)
+
+    def next_wakeup(self) -> float:
+        return min((self._next_due(it.name) for it in self.watchlist), default=time.time() + MAX_SLEEP)
+
+    def _poll(self, items: list[Item]):
+        print(f"\n[{datetime.now():%Y-%m-%d %H:%M}] 轮询 {len(items)} 个商品…")
+        if aldi := registry.backend("ALDI").loaded:
+            aldi.clear_page_cache()
+        # 跨运行的 HTTP 缓存（ALDI 默认 3 小时）不能比最短的轮询间隔还长
+        cache.cap(min(self.hot_interval, self.interval,
+                      *(it.poll_minutes * 60 for it in self.watchlist if it.poll_minutes)))
+        metrics.reset()
+        breaker.reset_strategies()
+        alerts = []
+        fresh = monitor.fetch_prices(items, monitor.alert_sink(self.detector, self.outbox, alerts))
+        monitor.save_prices(fresh)
+        monitor.save_baselines(self.detector)
+        metrics.write()
+
+        now = time.time()
+        for item in items:
+            name = item.name
+            hot  = self._is_hot(item, self.snapshot.get(name, {}), fresh.get(name, {}))
+            self.snapshot.setdefault(name, {}).update(fresh.get(name, {}))
+            wait = item.poll_minutes * 60 or (self.hot_interval if hot else self.interval)
+            self.state["items"][name] = {"next_due": now + wait, "hot": hot}
+
+    def _is_hot(self, item: Item, old: dict, new: dict) -> bool:
+        threshold = item.threshold
+        for store, r in new.items():
+            if r.get("on_special"):
+                return True
+            op = old.get(store, {}).get("price")
+            if op is not None and abs(r["price"] - op) >= threshold * HOT_FRACTION:
+                return True
+        return False
+
+    def _next_due(self, name: str) -> float:
+        return self.state["items"].get(name, {}).get("next_due", 0)
+
+    def _reload_watchlist(self):
+        mtime = monitor.WATCHLIST_FILE.stat().st_mtime
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        try:
+            self.watchlist = monitor.load_watchlist()
+        except WatchlistError as e:
+            print(f"  ❌ {e}\n  继续使用上一份 watchlist")
+            return
+        self.detector.thresholds = monitor.alert_thresholds(self.watchlist)
+        print(f"  已载入 watchlist：{len(self.watchlist)} 个商品")
+
+    def _daily_summary(self):
+        now   = datetime.now()
+        today = now.date().isoformat()
+        if now.hour >= SUMMARY_HOUR and self.state.get("last_summary") != today:
+            names = {it.name for it in self.watchlist}
+            self.outbox.put(daily_summary_message(
+                {k: v for k, v in self.snapshot.items() if k in names},
+                monitor.summary_insights(),
+            ))
+            self.state["last_summary"] = today
+
+
+def run(interval: float, hot_interval: float):
+    poller = Poller(interval, hot_interval)
+    stop   = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    print(f"常驻模式启动：普通 {interval / 60:.0f} 分钟 / 重点 {hot_interval / 60:.0f} 分钟")
+    while not stop.is_set():
+        try:
+            poller.tick()
+        except Exception as e:
+            print(f"  [poller] 本轮失败: {e}")
+        stop.wait(min(MAX_SLEEP, max(1.0, poller.next_wakeup() - time.time())))
+
+    poller.outbox.close()
+    _save_state(poller.state)
+    print("常驻模式已退出")
+
+
+def _load_state() -> dict:
+    try:
+        state = json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        state = {}
+    state.setdefault("items", {})
+    return state
+
+
+def _save_state(state: dict):
+    STATE_FILE.parent.mkdir(exist_ok=True)
+    STATE_FILE.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Carnegie 3163 超市价格监控（常驻模式）")
+    ap.add_argument("--interval", type=float, default=360, help="普通商品轮询间隔（分钟）")
+    ap.add_argument("--hot-interval", type=float, default=60, help="特价 / 临近阈值商品的轮询间隔（分钟）")
+    ap.add_argument("--no-cache", action="store_true", help="绕过跨运行的 HTTP 响应缓存（也可设 HTTP_CACHE=off）")
+    args = ap.parse_args()
+    if args.no_cache:
+        cache.disable()
+    run(args.interval * 60, args.hot_interval * 60)
@@ -0,0 +1,103 @@
+"""
+自适应轮询 — 把每家店固定的请求预算花在最可能已经变价的商品上
+
+从价格历史（storage.history）估计每个 (商品, 门店)（多个分店的变价合并统计）：
+  rate      平时每天的变价次数
+  rollover  跨过一次周三特价轮换后变价的概率（仅 Woolworths / Coles）
+据此算出"距上次抓取以来已变价"的概率，每家店按概率从高到低取满预算；
+超过 max_staleness 没抓过（或从没抓到过）的商品不占竞争、一定会抓。
+"""
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+HISTORY_DAYS     = 90
+ROLLOVER_STORES  = {"Woolworths", "Coles"}
+ROLLOVER_WEEKDAY = 2   # 周三
+
+# 先验：平均两周变一次价（相当于 7 天的观测），轮换后变价概率 1/4（相当于 4 次观测）
+_RATE_PRIOR_CHANGES, _RATE_PRIOR_DAYS = 0.5, 7.0
+_ROLL_PRIOR_CHANGED, _ROLL_PRIOR_SEEN = 1.0, 4.0
+
+
+@dataclass(slots=True)
+class Stats:
+    last_ts:  datetime | None = None
+    rate:     float = _RATE_PRIOR_CHANGES / _RATE_PRIOR_DAYS
+    rollover: float = _ROLL_PRIOR_CHANGED / _ROLL_PRIOR_SEEN
+
+
+def load_stats(conn, now: datetime | None = None) -> dict[tuple[str, str], Stats]:
+    """按 (item, store, branch, ts) 顺序扫一遍最近 HISTORY_DAYS 天的历史"""
+    now   = now or datetime.now()
+    since = (now - timedelta(days=HISTORY_DAYS)).isoformat(timespec="seconds")
+    stats, acc = {}, {}
+    prev_series = prev_ts = prev_price = None
+    for item, store, branch, ts, price in conn.execute(
+        "SELECT item, store, COALESCE(branch, ''), ts, price FROM observations "
+        "WHERE ts >= ? ORDER BY item, store, 3, ts",
+        (since,),
+    ):
+        key    = (item, store)
+        series = (item, store, branch)   # 只和同一分店的上一次比较
+        ts     = datetime.fromisoformat(ts)
+        a      = acc.setdefault(key, [0.0, 0.0, 0.0, 0.0])   # 平时变价次数, 平时天数, 轮换变价次数, 轮换次数
+        if series == prev_series:
+            changed = price != prev_price
+            if store in ROLLOVER_STORES and rollovers_between(prev_ts, ts):
+                a[2] += changed
+                a[3] += 1
+            else:
+                a[0] += changed
+                a[1] += (ts - prev_ts).total_seconds() / 86400
+        prev_series, prev_ts, prev_price = series, ts, price
+        s = stats.setdefault(key, Stats())
+        s.last_ts = max(s.last_ts, ts) if s.last_ts else ts
+
+    for key, (changes, days, roll_changed, roll_seen) in acc.items():
+        s = stats[key]
+        s.rate     = (changes + _RATE_PRIOR_CHANGES) / (days + _RATE_PRIOR_DAYS)
+        s.rollover = (roll_changed + _ROLL_PRIOR_CHANGED) / (roll_seen + _ROLL_PRIOR_SEEN)
+    return stats
+
+
+def rollovers_between(a: datetime, b: datetime) -> int:
+    """(a, b] 之间经过了几个周三 00:00"""
+    if b <= a:
+        return 0
+    first = datetime.combine(a.date(), datetime.min.time()) + timedelta(
+        days=(ROLLOVER_WEEKDAY - a.weekday()) % 7 or 7
+    )
+    return 0 if first > b else 1 + (b - first).days // 7
+
+
+def change_probability(s: Stats, store: str, now: datetime) -> float:
+    if s.last_ts is None:
+        return 1.0
+    days = max((now - s.last_ts).total_seconds() / 86400, 0.0)
+    p_stay = math.exp(-s.rate * days)
+    if store in ROLLOVER_STORES:
+        p_stay *= (1 - s.rollover) ** rollovers_between(s.last_ts, now)
+    return 1 - p_stay
+
+
+def plan(lanes: dict[str, list[tuple[int, str]]], stats: dict, budget: int,
+         max_staleness: timedelta, now: datetime | None = None) -> dict[str, set[int]]:
+    """
+    lanes: {门店: [(watchlist 序号, 商品名)]}，返回 {门店: 本次要抓的序号集合}。
+    过期商品全部入选（可能超出预算），其余按变价概率取到预算为止。
+    """
+    now = now or datetime.now()
+    chosen = {}
+    for store, items in lanes.items():
+        must, ranked = set(), []
+        for idx, name in items:
+            s = stats.get((name, store)) or Stats()
+            if s.last_ts is None or now - s.last_ts >= max_staleness:
+                must.add(idx)
+            else:
+                ranked.append((change_probability(s, store, now), idx))
+        ranked.sort(reverse=True)
+        room = max(budget - len(must), 0)
+        chosen[store] = must | {idx for _, idx in ranked[:room]}
+    return chosen
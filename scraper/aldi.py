@@ -1,14 +1,19 @@
 """
 ALDI 爬虫 — cloudscraper 版，三重选择器策略
 ALDI 全国统一价，Carnegie Central 和 Glen Huntly 两家价格相同。
+分类页走条件请求（scraper.conditional），页面没变时直接复用上次各关键词的结果。
+关键词第一次匹配时按词重合和规格打分（scraper.resolver）选定商品，记下它的商品链接
+（data/aldi_products.json）；之后在分类页上按链接直接找这个商品，链接不见了才重新匹配。
+全国统一价：branch 只决定记录里的分店名，不影响请求，所有分店共用同一次抓取。
 """
 import re
-import cloudscraper
-from bs4 import BeautifulSoup
+import threading
+from pathlib import Path
+
+from scraper import conditional, metrics, resolver
+from scraper.branches import DEFAULTS, Branch
+from scraper.records import Record
 
-_scraper = cloudscraper.create_scraper(
-    browser={"browser": "chrome", "platform": "darwin", "mobile": False}
-)
 
 HEADERS = {
     "Accept":          "text/html,application/xhtml+xml,*/*;q=0.8",
@@ -24,98 +29,229 @@ CATEGORY_URLS = {
     "chicken": "https://www.aldi.com.au/en/groceries/meat-seafood/",
 }
 
-BRANCH = "Carnegie Central / Glen Huntly (统一价)"
+DEFAULT_BRANCH = DEFAULTS["ALDI"]   # Carnegie Central / Glen Huntly
+IDS_FILE       = Path("data/aldi_products.json")   # aldi_keyword → 商品链接
+
+_ids = resolver.Identities(IDS_FILE)
+
+
+def get_price(keyword: str, branch: Branch | None = None) -> Record | None:
+    result = _get_price(keyword)
+    if result and branch:
+        result = result.with_branch(branch.name)
+    return result
+
 
+def category_for(keyword: str) -> str | None:
+    """关键词里出现的分类名决定去哪个分类页找；没有配置的返回 None（watchlist 编译时会报出来）"""
+    kw_lower = keyword.lower()
+    return next((u for k, u in CATEGORY_URLS.items() if k in kw_lower), None)
 
-def get_price(keyword: str) -> dict | None:
-    kw_lower     = keyword.lower()
-    category_url = next((u for k, u in CATEGORY_URLS.items() if k in kw_lower), None)
 
+def _get_price(keyword: str) -> Record | None:
+    category_url = category_for(keyword)
     if not category_url:
         print(f"    [ALDI] 未配置分类 URL: '{keyword}'")
         return None
 
+    page = _get_page(category_url)
+    if page is None:
+        return None
+    if "records" in page:
+        # 分类页自上次以来没变：复用上次该关键词的结果，新关键词才需要完整页面
+        if keyword in page["records"]:
+            return page["records"][keyword]
+        page = _get_page(category_url, revalidate=False)
+        if page is None:
+            return None
+
+    result = _lookup(page, keyword)
+    if result:
+        conditional.remember(category_url, keyword, result)
+    return result
+
+
+def get_prices(keywords: list[str], branch: Branch | None = None) -> dict[str, Record | None]:
+    """批量接口，与 Woolworths / Coles 一致；同一分类页在本次运行里只抓一次"""
+    out = {kw: get_price(kw, branch) for kw in dict.fromkeys(keywords)}
+    _ids.save()
+    return out
+
+
+def _lookup(page: dict, keyword: str) -> Record | None:
+    # 已选定过商品：按商品链接直接找
+    if pid := _ids.get(keyword):
+        with metrics.span("ALDI", "id") as s:
+            found = s["hit"] = next(((st, hit) for st in ("new", "old")
+                                     if (hit := page[st].by_id(pid))), None)
+        if found:
+            strategy, (name, price) = found
+            return _build(name if name is not None else keyword, price, strategy)
+        _ids.drop(keyword)   # 下架或换了链接：重新匹配
+
+    # 三重策略按优先级查索引，任意命中就返回
+    kw_lower = keyword.lower()
+    query    = resolver.terms(kw_lower)
+    for strategy in ("new", "old", "generic"):
+        with metrics.span("ALDI", strategy) as s:
+            index = page[strategy] if strategy != "generic" else _generic_index(page)
+            hit = s["hit"] = index.lookup(query, kw_lower if strategy == "generic" else None)
+        if hit:
+            name, price, pid, score = hit
+            if pid:
+                _ids.set(keyword, pid, name, score)
+            return _build(name if name is not None else keyword, price, strategy)
+    return None
+
+
+# ── 分类页缓存：每个分类 URL 每次运行只下载、解析一次 ─────────────────────────
+# 跨运行的 HTML 缓存由 scraper.cache 统一负责（TTL 见 cache.TTL["ALDI"]）。
+
+_pages: dict[str, dict] = {}
+_pages_lock = threading.Lock()
+
+
+def clear_page_cache():
+    """开始新一轮抓取前调用（常驻模式），让各分类页重新验证"""
+    with _pages_lock:
+        _pages.clear()
+
+
+def _get_page(url: str, revalidate: bool = True) -> dict | None:
+    """
+    已解析的页面 {"soup", "new", "old", ...}，
+    或内容未变时的 {"records": {keyword: record}}（revalidate=False 时总是拿完整页面）。
+    """
+    with _pages_lock:
+        page = _pages.get(url)
+        if page is not None and (revalidate or "records" not in page):
+            return page
+        page = metrics.timed("ALDI", "page", _load_page, url, revalidate)
+        if page is not None:
+            _pages[url] = page
+        return page
+
+
+def _load_page(url: str, revalidate: bool) -> dict | None:
     try:
-        resp = _scraper.get(category_url, headers=HEADERS, timeout=20)
+        resp, records = conditional.get(
+            "ALDI", url, headers=HEADERS, revalidate=revalidate, timeout=20
+        )
+        if records is not None:
+            return {"records": records}
         resp.raise_for_status()
     except Exception as e:
         print(f"    [ALDI] 请求失败: {e}")
         return None
+    return _index_page(resp.text)
 
-    soup = BeautifulSoup(resp.text, "html.parser")
 
-    # 三重策略，任意命中就返回
-    return (
-        _strategy_new(soup, kw_lower, keyword)
-        or _strategy_old(soup, kw_lower, keyword)
-        or _strategy_generic(soup, kw_lower, keyword)
-    )
+def _index_page(html: str) -> dict:
+    """解析一次，为两种 tile 结构各建一份商品索引；通用兜底索引按需再建"""
+    from bs4 import BeautifulSoup   # 只有真的要解析 ALDI 页面时才付这笔 import
+    soup = BeautifulSoup(html, "html.parser")
+    return {
+        "soup": soup,
+        "new":  _ProductIndex(_card_entry(c) for c in soup.select(_NEW_SELECTOR)),
+        "old":  _ProductIndex(_card_entry(c) for c in soup.select(_OLD_SELECTOR)),
+    }
 
 
-def _strategy_new(soup, kw_lower, keyword):
-    """新版 ALDI tile 结构（2024 年后）"""
-    cards = soup.select(
-        "li.ft-product-tile, li[class*='product-tile'], "
-        "div[class*='product-tile'], article[class*='tile']"
-    )
-    return _match(cards, kw_lower, keyword, "new")
+def _card_entry(card):
+    text = card.get_text(" ", strip=True)
+    name_el = card.select_one(_NAME_SELECTOR)
+    link    = card.select_one("a[href*='/product/']")
+    pid     = link["href"].split("?")[0].rstrip("/").rsplit("/", 1)[-1] if link else None
+    return text, name_el.get_text(strip=True) if name_el else None, (), pid
 
 
-def _strategy_old(soup, kw_lower, keyword):
-    """旧版 ALDI 结构"""
-    cards = soup.select(
-        "div.tile--product, div.product-item, "
-        "div[data-module='product'], li[class*='item']"
-    )
-    return _match(cards, kw_lower, keyword, "old")
+# ── 三重选择器策略 → 商品索引 ─────────────────────────────────────────────────
 
+# 新版 ALDI tile 结构（2024 年后）
+_NEW_SELECTOR = (
+    "li.ft-product-tile, li[class*='product-tile'], "
+    "div[class*='product-tile'], article[class*='tile']"
+)
+# 旧版 ALDI 结构
+_OLD_SELECTOR = (
+    "div.tile--product, div.product-item, "
+    "div[data-module='product'], li[class*='item']"
+)
+_NAME_SELECTOR = "[class*='name'], [class*='title'], h2, h3"
+_BLOCK_TAGS    = ["li", "article", "div", "section"]
+
+_PRICE_RE = re.compile(r"\$\s*(\d+\.\d{2})")
 
-def _strategy_generic(soup, kw_lower, keyword):
+
+class _ProductIndex:
     """
-    通用兜底：找包含关键词的任意块级元素里的 $x.xx 价格。
-    不依赖 class 名，对 HTML 结构变化最具鲁棒性。
+    一种策略下的商品倒排索引：词 → 商品序号，另有商品链接 → 序号。
+    只收录带 $x.xx 价格的块；查询先用倒排表找出至少有一个词重合的候选，
+    再按 resolver.score 打分取最高的，同分取页面上靠前的。
     """
-    kw_words = kw_lower.split()
-    for tag in soup.find_all(string=re.compile(kw_lower, re.I)):
-        container = tag.find_parent(["li", "article", "div", "section"])
-        if not container:
-            continue
-        text = container.get_text(" ", strip=True)
-        if len(text) > 600 or not any(w in text.lower() for w in kw_words):
-            continue
-        price_m = re.search(r"\$\s*(\d+\.\d{2})", text)
-        if price_m:
-            name_el = container.select_one("h2, h3, [class*='name'], [class*='title']")
-            return _build(
-                name_el.get_text(strip=True) if name_el else keyword,
-                float(price_m.group(1)),
-                "generic",
-            )
-    return None
 
+    def __init__(self, entries):
+        self.items    = []   # (名称, 价格, 文本节点列表, 商品链接, resolver.Terms)
+        self.postings = {}
+        self.ids      = {}
+        for text, name, phrases, pid in entries:
+            price_m = _PRICE_RE.search(text)
+            if not price_m:
+                continue
+            pos   = len(self.items)
+            terms = resolver.terms(text)
+            self.items.append((name, float(price_m.group(1)), phrases, pid, terms))
+            for tok in terms.tokens:
+                self.postings.setdefault(tok, []).append(pos)
+            if pid:
+                self.ids.setdefault(pid, pos)
 
-def _match(cards, kw_lower, keyword, strategy):
-    kw_words = kw_lower.split()
-    for card in cards:
-        text = card.get_text(" ", strip=True)
-        if not any(w in text.lower() for w in kw_words):
-            continue
-        price_m = re.search(r"\$\s*(\d+\.\d{2})", text)
-        if not price_m:
-            continue
-        name_el = card.select_one("[class*='name'], [class*='title'], h2, h3")
-        name    = name_el.get_text(strip=True) if name_el else keyword
-        return _build(name, float(price_m.group(1)), strategy)
-    return None
+    def by_id(self, pid: str):
+        if (pos := self.ids.get(pid)) is None:
+            return None
+        name, price, *_ = self.items[pos]
+        return name, price
 
+    def lookup(self, query: resolver.Terms, phrase: str | None = None):
+        """(名称, 价格, 商品链接, 分数) 或 None"""
+        hits = set()
+        for tok in query.tokens:
+            hits.update(self.postings.get(tok, ()))
+        if phrase is not None:
+            hits = {p for p in hits if any(phrase in t for t in self.items[p][2])}
+        best = resolver.best(query, ((p, self.items[p][4]) for p in sorted(hits)))
+        if best is None:
+            return None
+        name, price, _, pid, _ = self.items[best[0]]
+        return name, price, pid, best[1]
 
-def _build(name, price, source):
-    return {
-        "store":      "ALDI",
-        "branch":     BRANCH,
-        "name":       name,
-        "price":      price,
-        "was_price":  None,
-        "on_special": False,
-        "source":     source,
-    }
+
+def _generic_index(page: dict) -> _ProductIndex:
+    """
+    通用兜底：任意块级元素里的 $x.xx 价格。
+    不依赖 class 名，对 HTML 结构变化最具鲁棒性。
+    一次遍历全部文本节点，按最近的块级父元素归组；查询时要求关键词整句
+    出现在该块的某个文本节点里。
+    """
+    if "generic" not in page:
+        groups = {}
+        for node in page["soup"].find_all(string=True):
+            if not node.strip():
+                continue
+            container = node.find_parent(_BLOCK_TAGS)
+            if container is None:
+                continue
+            groups.setdefault(id(container), (container, []))[1].append(node.lower())
+        entries = []
+        for container, phrases in groups.values():
+            text = container.get_text(" ", strip=True)
+            if len(text) > 600:
+                continue
+            name_el = container.select_one(_NAME_SELECTOR)
+            entries.append((text, name_el.get_text(strip=True) if name_el else None, phrases, None))
+        page["generic"] = _ProductIndex(entries)
+    return page["generic"]
+
+
+def _build(name, price, source) -> Record:
+    return Record("ALDI", DEFAULT_BRANCH.name, name, price, source=source)
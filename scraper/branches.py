@@ -0,0 +1,50 @@
+"""
+分店配置 — 每次取价都指定 (零售商, 分店)
+
+branches.json（可选，仓库根目录）按零售商列出要监控的分店：
+    {
+      "Woolworths": [{"id": "3298", "name": "Carnegie North #3298", "postcode": "3163"}, ...],
+      "Coles":      [{"id": "7724", "name": "Carnegie Central"}, ...],
+      "ALDI":       [{"id": "carnegie", "name": "Carnegie Central"}, ...]
+    }
+文件不存在、或某家零售商没写时，用 DEFAULTS 里原来的 Carnegie 分店。
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+BRANCHES_FILE = Path("branches.json")
+
+
+@dataclass(frozen=True, slots=True)
+class Branch:
+    retailer: str
+    id:       str
+    name:     str      # 写进记录的 branch 字段，也是快照键的一部分
+    postcode: str = ""
+
+
+DEFAULTS = {
+    "Woolworths": Branch("Woolworths", "3298", "Carnegie North #3298", "3163"),
+    "Coles":      Branch("Coles",      "7724", "Carnegie Central",     "3163"),
+    "ALDI":       Branch("ALDI",       "",     "Carnegie Central / Glen Huntly (统一价)", "3163"),
+}
+
+
+def defaults() -> dict[str, list[Branch]]:
+    return {retailer: [b] for retailer, b in DEFAULTS.items()}
+
+
+def load(path: Path = BRANCHES_FILE) -> dict[str, list[Branch]]:
+    out = defaults()
+    if not path.exists():
+        return out
+    for retailer, entries in json.loads(path.read_text(encoding="utf-8")).items():
+        if retailer not in DEFAULTS:
+            print(f"  [branches] 未知零售商，已忽略: {retailer}")
+            continue
+        out[retailer] = [
+            Branch(retailer, str(e["id"]), e.get("name") or str(e["id"]), str(e.get("postcode", "")))
+            for e in entries
+        ] or out[retailer]
+    return out
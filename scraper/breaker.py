@@ -0,0 +1,177 @@
+"""
+熔断与自适应退避 — 按主机统计，所有出站请求共用（由 scraper.fetch 调用）
+
+Cloudflare 开始拦截时，逐个商品去撞只会把整次运行的时间耗在注定失败的请求上：
+  熔断   同一主机连续 FAILURES 次失败（429 / 5xx / 超时 / 连接异常）就打开，
+         冷却期内该主机的请求直接抛 CircuitOpen，不发出去；冷却结束放一个探测请求，
+         成功即关闭，失败则冷却时间翻倍（最多 MAX_COOLDOWN）
+  退避   失败后推迟该门店的下一个请求：有 Retry-After 按它，否则按连续失败次数指数增长；
+         响应明显变慢时拉长礼貌间隔（scraper.throttle），恢复正常后逐步缩回
+  超时   主机出现过超时后，超时时间收紧到最近正常耗时的 TIMEOUT_FACTOR 倍，不再等满 20 秒
+  重试   超时 / 连接异常 / 429 / 502–504 在熔断未打开时退避后重试一次
+403 不算主机失败：Cloudflare 常常只拦 API 路径，同一主机的 HTML 页面还能用，
+这种情况交给下面的策略级统计；404 之类的正常"没有"也不算。
+主机状态留在进程内，常驻模式下跨轮询保留。
+
+策略级：attempt(store, strategy, fn) 统计每个降级策略的端点失败率，
+某个策略已试过 MIN_TRIES 次且失败率达到 DEAD_RATE，本次运行余下的商品直接跳过它。
+只有这次尝试里请求出错（4xx / 5xx、异常、熔断）才算失败；请求正常但没解析出价格
+（商品缺货、下架）不算，否则几个缺货商品就会把能用的策略整个关掉。
+"""
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from scraper import metrics, throttle
+
+FAILURES        = 3       # 连续失败几次打开熔断
+COOLDOWN        = 300.0   # 首次熔断冷却（秒）
+MAX_COOLDOWN    = 3600.0
+BACKOFF_BASE    = 2.0     # 无 Retry-After 时的退避起点（秒），按连续失败次数翻倍
+MAX_BACKOFF     = 60.0
+RETRY_STATUS    = {429, 502, 503, 504}
+SLOW_FACTOR     = 3.0     # 比平均耗时慢这么多倍算"变慢"
+TIMEOUT_FACTOR  = 4.0
+MIN_TIMEOUT     = 5.0
+MIN_TRIES       = 5       # 策略至少试过几次才判断
+DEAD_RATE       = 0.8     # 策略失败率达到这个比例就跳过
+
+
+class CircuitOpen(RuntimeError):
+    pass
+
+
+@dataclass(slots=True)
+class _Host:
+    streak:   int          = 0
+    opened:   float        = 0.0        # 打开时刻（monotonic），0 为关闭
+    cooldown: float        = COOLDOWN
+    probing:  bool         = False      # 半开：已放出一个探测请求
+    latency:  float | None = None       # 成功请求耗时的滑动平均（秒）
+    timeouts: int          = 0
+
+
+_lock       = threading.Lock()
+_local      = threading.local()   # failed：当前线程这次 attempt 里是否有请求出错
+_hosts:      dict[str, _Host]       = {}
+_strategies: dict[tuple, list[int]] = {}   # (store, strategy) → [次数, 失败]
+
+
+def host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def check(url: str):
+    """发请求前调用：熔断打开且还在冷却期内抛 CircuitOpen；冷却结束只放一个探测请求"""
+    with _lock:
+        h = _hosts.get(host(url))
+        if h is None or not h.opened:
+            return
+        left = h.opened + h.cooldown - time.monotonic()
+        if left > 0 or h.probing:
+            _local.failed = True
+            raise CircuitOpen(f"{host(url)} 熔断中（{max(left, 0):.0f}s 后再试）")
+        h.probing = True
+
+
+def blocked(url: str) -> bool:
+    """主机熔断且还在冷却期内（批量循环里用来提前收手）"""
+    with _lock:
+        h = _hosts.get(host(url))
+        return bool(h and h.opened and (h.probing or time.monotonic() < h.opened + h.cooldown))
+
+
+def timeout(url: str, requested: float | None) -> float | None:
+    """出现过超时的主机按最近正常耗时收紧超时"""
+    h = _hosts.get(host(url))
+    if requested is None or h is None or not h.timeouts or h.latency is None:
+        return requested
+    return min(requested, max(MIN_TIMEOUT, h.latency * TIMEOUT_FACTOR))
+
+
+def record(store: str, url: str, status: int | None, seconds: float,
+           retry_after: str | None = None, timed_out: bool = False) -> bool:
+    """
+    记一次请求结果（status=None 为异常，timed_out 标明是否超时）。
+    返回是否值得重试：可重试的失败、熔断没有因此打开时为真。
+    """
+    failed = status is None or status == 429 or status >= 500
+    name   = host(url)
+    if status is None or status >= 400:
+        _local.failed = True
+    with _lock:
+        h = _hosts.setdefault(name, _Host())
+        if not failed:
+            slow = h.latency is not None and seconds > max(SLOW_FACTOR * h.latency, 1.0)
+            h.latency = seconds if h.latency is None else 0.8 * h.latency + 0.2 * seconds
+            if h.opened:
+                print(f"    [熔断] {name} 已恢复")
+            h.streak, h.opened, h.cooldown, h.probing = 0, 0.0, COOLDOWN, False
+        else:
+            h.streak  += 1
+            h.timeouts += timed_out
+            if h.probing:
+                h.opened, h.probing = time.monotonic(), False
+                h.cooldown = min(h.cooldown * 2, MAX_COOLDOWN)
+                print(f"    [熔断] {name} 探测失败，再暂停 {h.cooldown:.0f}s")
+            elif not h.opened and h.streak >= FAILURES:
+                h.opened = time.monotonic()
+                print(f"    [熔断] {name} 连续 {h.streak} 次失败，暂停 {h.cooldown:.0f}s")
+                metrics.inc("circuit_open_total", store=store)
+            delay  = _backoff(retry_after, h.streak)
+            closed = not h.opened
+    if not failed:
+        if slow:
+            throttle.slow_down(store)
+        else:
+            throttle.recover(store)
+        return False
+    throttle.defer(store, delay)
+    return closed and (status is None or status in RETRY_STATUS)
+
+
+def _backoff(retry_after: str | None, streak: int) -> float:
+    try:
+        return min(float(retry_after), MAX_BACKOFF)
+    except (TypeError, ValueError):
+        return min(BACKOFF_BASE * 2 ** (streak - 1), MAX_BACKOFF)
+
+
+# ── 策略级：失败率过高的降级策略本次运行不再尝试 ─────────────────────────────
+
+def attempt(store: str, strategy: str, fn, *args, **kwargs):
+    """metrics.timed 加上策略熔断：已判定失效的策略直接返回 None，不调用 fn"""
+    stats = _strategy(store, strategy)
+    with _lock:
+        if _dead(stats):
+            metrics.inc("strategy_skipped_total", store=store, strategy=strategy)
+            return None
+    _local.failed = False
+    failed = True
+    try:
+        result = metrics.timed(store, strategy, fn, *args, **kwargs)
+        failed = not result and _local.failed
+    finally:
+        with _lock:
+            was_dead = _dead(stats)
+            stats[0] += 1
+            stats[1] += failed
+            if _dead(stats) and not was_dead:
+                print(f"    [熔断] {store} {strategy} 请求出错 {stats[1]}/{stats[0]} 次，本轮余下商品跳过")
+    return result
+
+
+def _strategy(store: str, strategy: str) -> list[int]:
+    with _lock:
+        return _strategies.setdefault((store, strategy), [0, 0])
+
+
+def _dead(stats: list[int]) -> bool:
+    return stats[0] >= MIN_TRIES and stats[1] >= DEAD_RATE * stats[0]
+
+
+def reset_strategies():
+    """新一轮抓取前调用（常驻模式）：策略重新给机会，主机熔断状态保留"""
+    with _lock:
+        _strategies.clear()
@@ -0,0 +1,162 @@
+"""
+跨运行的 HTTP 响应缓存 — data/http_cache.db（SQLite）
+
+fetch.get 的 200 响应按 (门店, URL, 参数, 变体) 存下来，TTL 内的后续运行直接复用，
+手动重跑、调试时不会再把三家店都重新下一遍：
+  - 每家店各自的 TTL（TTL）；Woolworths / Coles 的缓存不跨周三 00:00 特价轮换
+  - 总大小超过 MAX_BYTES 时按最近使用时间淘汰（LRU）
+  - HTTP_CACHE=off 或 monitor.py --no-cache 绕过缓存（既不读也不写）
+  - 常驻模式用 cap() 把 TTL 压到轮询间隔以内，否则重新抓取拿到的还是上一轮的页面
+命中时返回的是重建的 requests.Response，上层（条件请求、解析）无感知。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+from scraper import metrics
+
+DB_FILE   = Path("data/http_cache.db")
+MAX_BYTES = int(float(os.environ.get("HTTP_CACHE_MAX_MB", "64")) * 1024 * 1024)
+TTL = {                                           # 秒
+    "Woolworths": 20 * 60,
+    "Coles":      20 * 60,
+    "ALDI":       int(os.environ.get("ALDI_CACHE_TTL", 3 * 3600)),   # 分类页全国统一，变得慢
+}
+ROLLOVER_STORES  = {"Woolworths", "Coles"}
+ROLLOVER_WEEKDAY = 2   # 周三
+
+enabled = os.environ.get("HTTP_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key     TEXT PRIMARY KEY,
+    store   TEXT NOT NULL,
+    url     TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body    BLOB NOT NULL,
+    size    INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    used    REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+"""
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def cap(seconds: float):
+    """各门店 TTL 不超过 seconds（只会缩短）"""
+    for store, ttl in TTL.items():
+        TTL[store] = min(ttl, int(seconds))
+
+
+def key(store: str, url: str, params=None, variant: str = "") -> str:
+    """variant：URL 之外决定响应内容的东西（如 Woolworths 的分店 Cookie）"""
+    if params:
+        items = params.items() if isinstance(params, dict) else params
+        url = f"{url}?{urlencode(sorted((str(k), str(v)) for k, v in items))}"
+    if variant:
+        url = f"{url} #{variant}"
+    return hashlib.sha1(f"{store} {url}".encode()).hexdigest()
+
+
+def lookup(store: str, url: str, params=None, variant: str = ""):
+    """未过期的缓存响应，或 None"""
+    if not enabled or TTL.get(store, 0) <= 0:
+        return None
+    k, now = key(store, url, params, variant), time.time()
+    with _lock:
+        conn = _connect()
+        row = conn.execute(
+            "SELECT url, headers, body, expires FROM responses WHERE key = ?", (k,)
+        ).fetchone()
+        # 过期时间比当前 TTL 还远：是 TTL 调短（cap）之前存的，不知道有多旧，不用
+        if row is None or row[3] <= now or row[3] > now + TTL[store]:
+            metrics.inc("http_cache_total", store=store, outcome="miss")
+            return None
+        conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, k))
+        conn.commit()
+    metrics.inc("http_cache_total", store=store, outcome="hit")
+    return _response(row[0], json.loads(row[1]), row[2])
+
+
+def put(store: str, url: str, params, resp, variant: str = ""):
+    """只缓存 200；写入后超出 MAX_BYTES 就淘汰最久没用过的条目"""
+    ttl = TTL.get(store, 0)
+    if not enabled or ttl <= 0 or resp.status_code != 200:
+        return
+    now     = time.time()
+    expires = now + ttl
+    if store in ROLLOVER_STORES:
+        expires = min(expires, next_rollover(datetime.fromtimestamp(now)).timestamp())
+    body    = resp.content
+    headers = json.dumps({k: v for k, v in resp.headers.items()
+                          if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")})
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key(store, url, params, variant), store, resp.url or url, headers, body, len(body), expires, now),
+        )
+        _evict(conn, now)
+        conn.commit()
+
+
+def next_rollover(now: datetime) -> datetime:
+    """now 之后的第一个周三 00:00"""
+    days = (ROLLOVER_WEEKDAY - now.weekday()) % 7 or 7
+    return datetime.combine(now.date(), datetime.min.time()) + timedelta(days=days)
+
+
+def clear():
+    with _lock:
+        conn = _connect()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+
+def _evict(conn: sqlite3.Connection, now: float):
+    conn.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    evicted = 0
+    for k, size in conn.execute("SELECT key, size FROM responses ORDER BY used").fetchall():
+        if total <= MAX_BYTES:
+            break
+        conn.execute("DELETE FROM responses WHERE key = ?", (k,))
+        total   -= size
+        evicted += 1
+    metrics.inc("http_cache_evictions_total", evicted)
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        DB_FILE.parent.mkdir(exist_ok=True)
+        _conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+def _response(url: str, headers: dict, body: bytes):
+    import requests
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.url         = url
+    resp._content    = body
+    resp.headers     = requests.structures.CaseInsensitiveDict(headers)
+    resp.encoding    = requests.utils.get_encoding_from_headers(resp.headers)
+    return resp
@@ -0,0 +1,234 @@
+"""
+价格变动检测 — 增量引擎
+
+ChangeDetector：内存里维护 (item, store, branch) → 上次价格 的索引，每来一条新观测
+只和索引比较一次，只有真正变动的记录才产出 Alert，代价与变动条数成正比（旧版 main.py 用）。
+
+BaselineDetector：每个 (item, store, branch) 维护一份增量统计（Baseline），
+每条观测 O(1) 更新，只在"历史新低 / 90 天新低 / 跌破基线"时提醒（monitor.py 用）。
+每周在特价和原价之间来回跳的商品不会每周提醒两次：回到原价不提醒，
+特价周期已经摸清、价格也不比以往的特价更低时也不提醒。
+"""
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_BELOW     = 0.10             # 低于基线多少比例算"跌破基线"
+EMA_TAU           = 14 * 86400       # 基线（指数滑动平均）的时间常数：按时间衰减，与轮询频率无关
+LOW_WINDOW        = 90 * 86400
+MIN_HISTORY       = 3                # 观测不足几次时不报新低（第一次出现的价格总是"最低"）
+
+
+@dataclass(slots=True)
+class Alert:
+    item:       str
+    store:      str
+    branch:     str
+    old_price:  float | None
+    new_price:  float
+    change:     float | None
+    on_special: bool = False
+    kind:       str  = "change"   # "change" 价格变动 | "new" 首次出现 | "low" 历史新低 | "low90" 90 天新低 | "below" 跌破基线
+    baseline:   float | None = None
+
+    @property
+    def pct(self) -> float | None:
+        if not self.old_price or self.change is None:
+            return None
+        return self.change / self.old_price * 100
+
+
+class ChangeDetector:
+    """
+    thresholds: {item: 绝对变动阈值}，缺省用 default；
+    new_items:  首次出现的 (item, store, branch) 是否也产出 kind="new" 的 Alert。
+    分店取自 record["branch"]，同一零售商的多个分店各自比较。
+    """
+
+    def __init__(self, thresholds: dict | None = None,
+                 default: float = DEFAULT_THRESHOLD, new_items: bool = False):
+        self.thresholds = thresholds or {}
+        self.default    = default
+        self.new_items  = new_items
+        self._last: dict[tuple[str, str, str], float] = {}
+
+    def seed(self, snapshot: dict):
+        """用上次的快照 {item: {store: record}} 初始化价格索引"""
+        self.seed_stream(observations(snapshot))
+
+    def seed_stream(self, stream: Iterable[tuple[str, str, dict]]):
+        for item, store, r in stream:
+            if r.get("price") is not None:
+                self._last[(item, store, r.get("branch") or "")] = r["price"]
+
+    def observe(self, item: str, store: str, record: dict) -> Alert | None:
+        np = record.get("price")
+        if np is None:
+            return None
+        key = (item, store, record.get("branch") or "")
+        op  = self._last.get(key)
+        self._last[key] = np
+        if op is None:
+            if not self.new_items:
+                return None
+            return Alert(item, store, record.get("branch", ""), None, np, None,
+                         record.get("on_special", False), kind="new")
+        change = round(np - op, 2)
+        if abs(change) < self.thresholds.get(item, self.default):
+            return None
+        return Alert(item, store, record.get("branch", ""), op, np, change,
+                     record.get("on_special", False))
+
+    def feed(self, stream: Iterable[tuple[str, str, dict]]) -> Iterator[Alert]:
+        for item, store, record in stream:
+            if alert := self.observe(item, store, record):
+                yield alert
+
+
+# ── 历史基线 ──────────────────────────────────────────────────────────────────
+
+@dataclass(slots=True)
+class Baseline:
+    n:             int          = 0
+    ema:           float | None = None
+    ts:            float | None = None         # 上次观测时间
+    price:         float | None = None         # 上次价格
+    on_special:    bool         = False
+    below:         bool         = False        # 上次观测是否已处于跌破基线状态（只在进入时提醒）
+    low:           float | None = None         # 历史最低
+    window:        deque        = field(default_factory=deque)   # 90 天最低的单调队列 [(ts, price)]
+    special_start: float | None = None         # 最近一次进入特价的时间
+    special_price: float | None = None         # 以往特价的最低价
+    specials:      int          = 0            # 进入特价的次数
+    cycle:         float | None = None         # 特价周期（秒，相邻两次进入特价间隔的滑动平均）
+
+    @property
+    def low90(self) -> float | None:
+        return self.window[0][1] if self.window else None
+
+    def expected_special(self, price: float) -> bool:
+        """周期性特价，且价格不比以往特价更低"""
+        return (self.specials >= 2 and self.special_price is not None
+                and price >= self.special_price - 0.005)
+
+    def expire(self, ts: float):
+        while self.window and self.window[0][0] < ts - LOW_WINDOW:
+            self.window.popleft()
+
+    def update(self, price: float, on_special: bool, ts: float):
+        if self.ema is None:
+            self.ema = price
+        else:
+            alpha = 1 - math.exp(-max(ts - self.ts, 0) / EMA_TAU)
+            self.ema += alpha * (price - self.ema)
+        self.low = price if self.low is None else min(self.low, price)
+        while self.window and self.window[-1][1] >= price:
+            self.window.pop()
+        self.window.append((ts, price))
+        self.expire(ts)
+        if on_special and not self.on_special:
+            if self.special_start is not None:
+                gap = ts - self.special_start
+                self.cycle = gap if self.cycle is None else (self.cycle + gap) / 2
+            self.special_start = ts
+            self.specials += 1
+        if on_special:
+            self.special_price = price if self.special_price is None else min(self.special_price, price)
+        self.n, self.ts, self.price, self.on_special = self.n + 1, ts, price, on_special
+
+    def to_dict(self) -> dict:
+        d = {k: getattr(self, k) for k in self.__slots__}
+        d["window"] = list(self.window)
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Baseline":
+        b = cls(**{k: v for k, v in d.items() if k in cls.__slots__ and k != "window"})
+        b.window = deque(tuple(w) for w in d.get("window", ()))
+        return b
+
+
+class BaselineDetector:
+    """
+    thresholds: {item: 跌破基线的比例}，缺省用 default。
+    接口与 ChangeDetector 相同（observe / feed），alert_sink 两者通用；
+    state() / dirty() 交给 storage.baselines 持久化，下次运行 load() 回来，不必重扫历史。
+    """
+
+    def __init__(self, thresholds: dict | None = None, default: float = DEFAULT_BELOW):
+        self.thresholds = thresholds or {}
+        self.default    = default
+        self._stats: dict[tuple[str, str, str], Baseline] = {}
+        self._dirty: set[tuple[str, str, str]] = set()
+
+    def load(self, states: dict):
+        self._stats.update((k, Baseline.from_dict(d)) for k, d in states.items())
+
+    def replay(self, stream: Iterable[tuple[str, str, dict, float]]):
+        """(item, store, record, ts) 历史观测流只更新统计、不提醒（首次运行时从历史库建基线）"""
+        for item, store, r, ts in stream:
+            if r.get("price") is not None:
+                key = (item, store, r.get("branch") or "")
+                self._stat(key).update(r["price"], bool(r.get("on_special")), ts)
+                self._dirty.add(key)
+
+    def baseline(self, item: str, store: str, branch: str = "") -> Baseline | None:
+        return self._stats.get((item, store, branch))
+
+    def observe(self, item: str, store: str, record: dict, ts: float | None = None) -> Alert | None:
+        np = record.get("price")
+        if np is None:
+            return None
+        ts      = time.time() if ts is None else ts
+        key     = (item, store, record.get("branch") or "")
+        b       = self._stat(key)
+        b.expire(ts)
+        special = bool(record.get("on_special"))
+        op, ema, low, low90 = b.price, b.ema, b.low, b.low90
+        below   = ema is not None and np <= ema * (1 - self.thresholds.get(item, self.default))
+        alert   = None
+        if b.n >= MIN_HISTORY:
+            kind = None
+            if np < low - 0.005:
+                kind = "low"
+            elif low90 is not None and np < low90 - 0.005:
+                kind = "low90"
+            elif below and not b.below and not (special and b.expected_special(np)):
+                kind = "below"
+            if kind:
+                alert = Alert(item, store, record.get("branch", ""), op, np,
+                              None if op is None else round(np - op, 2), special, kind, round(ema, 2))
+        b.update(np, special, ts)
+        b.below = below
+        self._dirty.add(key)
+        return alert
+
+    def feed(self, stream: Iterable[tuple[str, str, dict]]) -> Iterator[Alert]:
+        for item, store, record in stream:
+            if alert := self.observe(item, store, record):
+                yield alert
+
+    def state(self) -> dict:
+        return {k: b.to_dict() for k, b in self._stats.items()}
+
+    def dirty(self) -> dict:
+        """上次调用以来更新过的统计"""
+        out = {k: self._stats[k].to_dict() for k in self._dirty}
+        self._dirty.clear()
+        return out
+
+    def _stat(self, key) -> Baseline:
+        if (b := self._stats.get(key)) is None:
+            b = self._stats[key] = Baseline()
+        return b
+
+
+def observations(snapshot: dict) -> Iterator[tuple[str, str, dict]]:
+    """快照 → (item, store, record) 观测流"""
+    for item, stores in snapshot.items():
+        for store, r in stores.items():
+            if r:
+                yield item, store, r
@@ -4,22 +4,43 @@ Coles 爬虫 — cloudscraper 版
 Coles 的商品搜索 API BASE_URL 会轮换，无法永久硬编码。
 解决策略：
   1. 读缓存的有效 URL（data/coles_api_url.txt）
-  2. 缓存失效时，从搜索页 HTML 里动态解析当前 API URL
+  2. 缓存失效时，从搜索页 HTML 里动态解析当前 API URL（流式扫描，找到即停）
   3. 最后兜底：直接用 www.coles.com.au 主域
+每个 (base URL, storeId) 的连续失败记在 data/coles_endpoints.json（scraper.health）：
+只有跨多个查询连续出错才重新发现，单个查询搜不到不会触发；
+连续出错的 storeId 在冷却期内直接走不带 storeId 的搜索。
+主机被熔断（scraper.breaker）时余下查询直接放弃，主站熔断时也不去重新发现；
+熔断引起的失败不记入端点健康记录。
+
+查询按整份 watchlist 批量进行（get_prices）。搜索结果不再直接取第一条，
+而是按词重合和规格打分（scraper.resolver）选定商品，product ID 存到
+data/coles_products.json，之后的运行按 ID 批量直取；ID 取不到了才重新搜索。
+product ID 与分店无关，多个分店共用同一份映射；分店只体现在 storeId 参数上。
 """
 import re
 import json
+import threading
 from pathlib import Path
-import cloudscraper
-from bs4 import BeautifulSoup
 
-STORE_ID   = "7724"   # Coles Carnegie Central
-CACHE_FILE = Path("data/coles_api_url.txt")
-_API_PATH  = "/api/2.0/market/products"
+from scraper import breaker, fetch, metrics, resolver
+from scraper.branches import DEFAULTS, Branch
+from scraper.health import EndpointHealth
+from scraper.records import Record
+
+DEFAULT_BRANCH = DEFAULTS["Coles"]   # Carnegie Central
+
+SITE_URL    = "https://www.coles.com.au"
+CACHE_FILE  = Path("data/coles_api_url.txt")
+IDS_FILE    = Path("data/coles_products.json")   # coles_query → product ID
+HEALTH_FILE = Path("data/coles_endpoints.json")  # (base URL, storeId) 连续失败记录
+ID_BATCH    = 24                                 # 按 ID 直取时每次请求的商品数
+SEARCH_SIZE = 10                                 # 搜索时取回几个候选来打分
+_API_PATH   = "/api/2.0/market/products"
+
+_health        = EndpointHealth(HEALTH_FILE)
+_ids           = resolver.Identities(IDS_FILE)
+_discover_lock = threading.RLock()   # 并发通道里只让一个去发现，其余等它的结果
 
-_scraper = cloudscraper.create_scraper(
-    browser={"browser": "chrome", "platform": "darwin", "mobile": False}
-)
 
 BASE_HEADERS = {
     "Accept":          "application/json, text/plain, */*",
@@ -29,114 +50,246 @@ BASE_HEADERS = {
 }
 
 
-def get_price(query: str) -> dict | None:
+def get_price(query: str, branch: Branch | None = None) -> Record | None:
+    return get_prices([query], branch)[query]
+
+
+def get_prices(queries: list[str], branch: Branch | None = None) -> dict[str, Record | None]:
+    """
+    批量查询：整份 watchlist 的 coles_query 一次传进来。
+      1. 去重
+      2. 之前查到过 product ID 的，按 ID 批量直取（每次请求 ID_BATCH 个）
+      3. 其余逐个搜索；带 storeId → 不带 storeId，这两级对整批只各走一次
+      4. 端点跨查询连续出错时才重新发现 URL，换了 URL 后剩下的再搜一轮
+    """
+    branch  = branch or DEFAULT_BRANCH
+    queries = list(dict.fromkeys(queries))
+    out     = dict.fromkeys(queries)
     base_url = _get_base_url()
     if not base_url:
-        return None
+        return out
 
-    result = _fetch(base_url, query, store_id=STORE_ID)
-    if result:
-        return result
+    known    = {q: pid for q in queries if (pid := _ids.get(q))}
+    unpriced = set()
+    if known:
+        found = metrics.timed("Coles", "by_id", _fetch_by_ids, base_url,
+                              sorted(set(known.values())), branch.id)
+        for q, pid in known.items():
+            if pid not in found:
+                continue             # 这批请求出错：下面照常搜索，映射保留
+            item = found[pid]
+            if item is None:
+                _ids.drop(q)         # 请求成功却没有这个 ID：下架或换了 ID，重新搜索
+            elif _price_of(item):
+                out[q] = _build(item, q, "api_id", branch)
+            else:
+                unpriced.add(q)      # 商品还在，只是这次没有价格（缺货等）：不换商品
+                print(f"    [Coles] '{q}' 本次无价格")
 
-    # storeId 可能无效，不带 storeId 再试一次
-    result = _fetch(base_url, query, store_id=None)
-    if result:
-        return result
+    pending = [q for q in queries if out[q] is None and q not in unpriced]
+    for _ in range(2):
+        if not _health.skip(base_url, branch.id):
+            pending = _search_all(base_url, pending, branch, out)
+        # storeId 可能无效，不带 storeId 再试一次
+        pending = _search_all(base_url, pending, branch, out, any_store=True)
+        if not pending or not _health.failing(base_url) or breaker.blocked(SITE_URL):
+            break
+        # 跨多个查询连续出错：URL 多半已轮换
+        base_url = _rediscover(base_url)
+        if not base_url:
+            break
 
-    # URL 可能已轮换，强制刷新再试
-    print(f"    [Coles] URL 可能失效，重新发现...")
-    CACHE_FILE.unlink(missing_ok=True)
-    base_url = _get_base_url(force=True)
-    if base_url:
-        return _fetch(base_url, query, store_id=None)
+    _health.save()
+    _ids.save()
+    return out
 
-    return None
 
+def _search_all(base_url, queries, branch, out, any_store=False) -> list[str]:
+    """逐个搜索，命中写入 out 并记下 product ID；返回仍未命中的查询"""
+    missed   = []
+    strategy = "search_any_store" if any_store else "search"
+    store_id = None if any_store else branch.id
+    for n, q in enumerate(queries):
+        if _health.failing(base_url) or breaker.blocked(base_url):
+            # 端点已判定失效或被熔断，剩下的不再逐个去撞
+            missed.extend(queries[n:])
+            break
+        item = metrics.timed("Coles", strategy, _search, base_url, q, store_id)
+        if item is None:
+            missed.append(q)
+            continue
+        out[q] = _build(item, q, "api", branch)
+        if item.get("id"):
+            _ids.set(q, str(item["id"]), item.get("name"), item.get("_score"))
+    return missed
 
-def _fetch(base_url: str, query: str, store_id: str | None) -> dict | None:
-    url    = base_url.rstrip("/") + _API_PATH
-    params = {"q": query, "page": 1, "pageSize": 5}
+
+def _search(base_url: str, query: str, store_id: str | None) -> dict | None:
+    """搜索结果里与查询最匹配的有价商品（分数记在 "_score"）"""
+    params = {"q": query, "page": 1, "pageSize": SEARCH_SIZE}
     if store_id:
         params["storeId"] = store_id
+    results = [r for r in _get_products(base_url, params) or [] if _price_of(r)]
+    hit = resolver.best(resolver.terms(query), (
+        (n, resolver.terms(f"{r.get('brand') or ''} {r.get('name') or ''} {r.get('size') or ''}"))
+        for n, r in enumerate(results)
+    ))
+    if hit is None:
+        if results:
+            print(f"    [Coles] '{query}' 的搜索结果都不够匹配，跳过")
+        return None
+    return {**results[hit[0]], "_score": hit[1]}
+
+
+def _fetch_by_ids(base_url: str, product_ids: list[str], store_id: str) -> dict[str, dict | None]:
+    """
+    按 product ID 批量取商品：{product_id: 商品 JSON}（可能没有价格）；
+    请求成功但没返回的 ID 为 None（确实取不到了），请求出错的那批不出现在结果里。
+    """
+    found = {}
+    for i in range(0, len(product_ids), ID_BATCH):
+        chunk  = product_ids[i:i + ID_BATCH]
+        params = {"productIds": ",".join(chunk), "storeId": store_id,
+                  "page": 1, "pageSize": len(chunk)}
+        items = _get_products(base_url, params)
+        if items is None:
+            continue
+        found.update(dict.fromkeys(chunk))
+        for item in items:
+            if item.get("id"):
+                found[str(item["id"])] = item
+    return found
+
+
+def _get_products(base_url: str, params: dict) -> list | None:
+    """商品列表；端点出错返回 None（并记入健康记录），没搜到返回 []"""
+    url = base_url.rstrip("/") + _API_PATH
+    results = None
     try:
-        resp = _scraper.get(url, headers=BASE_HEADERS, params=params, timeout=20)
-        if resp.status_code not in (200, 201):
-            return None
-        data    = resp.json()
-        results = data.get("results", [])
-        if not results:
-            return None
-        item    = results[0]
-        pricing = item.get("pricing", {})
-        price   = pricing.get("now") or item.get("price")
-        if not price:
-            return None
-        return {
-            "store":      "Coles",
-            "branch":     "Carnegie Central",
-            "name":       item.get("name", query),
-            "price":      float(price),
-            "was_price":  pricing.get("was"),
-            "unit":       pricing.get("unit", {}).get("ofMeasurePrice", ""),
-            "on_special": pricing.get("promotionType") is not None,
-            "source":     "api",
-        }
+        resp = fetch.get("Coles", url, headers=BASE_HEADERS, params=params, timeout=20)
+        if resp.status_code in (200, 201):
+            results = resp.json().get("results", [])
+    except breaker.CircuitOpen:
+        return None
     except Exception as e:
         print(f"    [Coles] 请求异常: {e}")
-        return None
+    _health.record(base_url, params.get("storeId"), isinstance(results, list))
+    return results if isinstance(results, list) else None
 
 
+def _price_of(item: dict):
+    return item.get("pricing", {}).get("now") or item.get("price")
+
+
+def _build(item: dict, query: str, src: str, branch: Branch = DEFAULT_BRANCH) -> Record:
+    pricing = item.get("pricing", {})
+    return Record(
+        store      = "Coles",
+        branch     = branch.name,
+        name       = item.get("name", query),
+        price      = float(_price_of(item)),
+        was_price  = pricing.get("was"),
+        unit       = pricing.get("unit", {}).get("ofMeasurePrice", ""),
+        on_special = pricing.get("promotionType") is not None,
+        source     = src,
+    )
+
+
+# ── API BASE_URL 发现 ─────────────────────────────────────────────────────────
+
 def _get_base_url(force: bool = False) -> str | None:
-    if not force and CACHE_FILE.exists():
-        cached = CACHE_FILE.read_text().strip()
-        if cached:
-            return cached
-    url = _discover()
-    if url:
-        CACHE_FILE.parent.mkdir(exist_ok=True)
-        CACHE_FILE.write_text(url)
-    return url
+    with _discover_lock:
+        if not force and CACHE_FILE.exists():
+            cached = CACHE_FILE.read_text().strip()
+            if cached:
+                return cached
+        url = metrics.timed("Coles", "discover", _discover)
+        if url:
+            CACHE_FILE.parent.mkdir(exist_ok=True)
+            CACHE_FILE.write_text(url)
+        return url
+
+
+def _rediscover(stale: str) -> str | None:
+    """stale 被判定失效后调用；别的通道已经换过 URL 时直接用它换好的"""
+    with _discover_lock:
+        current = _get_base_url()
+        if current and current != stale:
+            return current
+        print(f"    [Coles] URL 连续出错，重新发现...")
+        _health.reset(stale)
+        CACHE_FILE.unlink(missing_ok=True)
+        return _get_base_url(force=True)
+
+
+_NEXT_TAG    = '<script id="__NEXT_DATA__"'
+_RUNTIME_RE = re.compile(r'"(?:runtimeConfig|publicRuntimeConfig)"\s*:\s*\{')
+_RUNTIME_KEYS = ("API_HOST", "API_BASE", "NEXT_PUBLIC_API_BASE", "apiBase")
+_JS_PATTERNS = (
+    re.compile(r'["\'](https://[a-z0-9\-]+\.coles\.com\.au)["\']'),
+    re.compile(r'baseURL\s*[:=]\s*["\'](https://[^"\']+)["\']'),
+)
+_OVERLAP     = 512         # 块与块之间保留的尾巴，跨块的匹配不会漏
+_MAX_CONFIG  = 256 * 1024  # runtimeConfig 对象最多缓冲这么多字符
+_json_decoder = json.JSONDecoder()
 
 
 def _discover() -> str | None:
     """从 Coles 搜索页的 __NEXT_DATA__ 或 JS 中提取 API BASE_URL"""
     try:
-        resp = _scraper.get(
-            "https://www.coles.com.au/search?q=milk",
+        chunks = fetch.stream(
+            "Coles",
+            f"{SITE_URL}/search?q=milk",
             headers={**BASE_HEADERS, "Accept": "text/html"},
             timeout=25,
         )
-        html = resp.text
-
-        # 方法1: __NEXT_DATA__ runtimeConfig
-        m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', html, re.DOTALL)
-        if m:
-            try:
-                data    = json.loads(m.group(1))
-                runtime = (data.get("runtimeConfig")
-                           or data.get("publicRuntimeConfig", {}))
-                for key in ("API_HOST", "API_BASE", "NEXT_PUBLIC_API_BASE", "apiBase"):
-                    val = runtime.get(key, "")
-                    if val and "coles.com.au" in val:
-                        print(f"    [Coles] 从 __NEXT_DATA__ 找到 API URL: {val}")
-                        return val.rstrip("/")
-            except Exception:
-                pass
-
-        # 方法2: JS 里正则找 API 子域
-        for pat in [
-            r'["\'](https://[a-z0-9\-]+\.coles\.com\.au)["\']',
-            r'baseURL\s*[:=]\s*["\'](https://[^"\']+)["\']',
-        ]:
-            for found in re.findall(pat, html):
-                if "www.coles.com.au" not in found:
-                    print(f"    [Coles] 从 JS 找到 API URL: {found}")
-                    return found.rstrip("/")
-
-        # 方法3: 兜底用主站
-        print("    [Coles] 使用主站 URL 作为兜底")
-        return "https://www.coles.com.au"
-
+        try:
+            how, url = _scan_config(chunks)
+        finally:
+            chunks.close()   # 提前找到时停止下载
     except Exception as e:
         print(f"    [Coles] URL 发现失败: {e}")
         return None
+    if url:
+        print(f"    [Coles] 从 {how} 找到 API URL: {url}")
+        return url.rstrip("/")
+    # 兜底用主站
+    print("    [Coles] 使用主站 URL 作为兜底")
+    return SITE_URL
+
+
+def _scan_config(chunks) -> tuple[str, str | None]:
+    """
+    边下载边扫描，不把整页攒起来再跑多遍正则：
+      方法1: __NEXT_DATA__ 里的 runtimeConfig —— 只解码这一个对象，解出来就停
+      方法2: JS 里的 API 子域 —— 各模式只记第一个候选，页面读完仍没有方法1时使用
+    """
+    tail, seen_next, config = "", False, None   # config: 正在缓冲的 runtimeConfig 文本
+    candidates = [None] * len(_JS_PATTERNS)
+    for chunk in chunks:
+        buf  = tail + chunk
+        tail = buf[-_OVERLAP:]
+        for i, pat in enumerate(_JS_PATTERNS):
+            if candidates[i] is None:
+                candidates[i] = next((m.group(1) for m in pat.finditer(buf)
+                                      if "www.coles.com.au" not in m.group(1)), None)
+        if config is None:
+            at = buf.find(_NEXT_TAG)
+            seen_next = seen_next or at >= 0
+            if not seen_next or not (m := _RUNTIME_RE.search(buf, max(at, 0))):
+                continue
+            config = buf[m.end() - 1:]
+        else:
+            config += chunk
+        try:
+            runtime, _ = _json_decoder.raw_decode(config)
+        except ValueError:
+            if len(config) > _MAX_CONFIG:
+                config = None   # 不像是完整的对象，放弃方法1
+            continue
+        config = None
+        for key in _RUNTIME_KEYS:
+            val = runtime.get(key) if isinstance(runtime, dict) else None
+            if isinstance(val, str) and "coles.com.au" in val:
+                return "__NEXT_DATA__", val
+    return "JS", next((c for c in candidates if c), None)
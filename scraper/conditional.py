@@ -0,0 +1,122 @@
+"""
+条件请求 — ETag / Last-Modified / 内容哈希
+
+每个 URL 记住上次响应的校验信息（data/http_validators.json）和解析出的记录
+（data/http_records.bin，scraper.records 的二进制快照，键为 (url[ #variant], 查询键)）：
+  1. 带 If-None-Match / If-Modified-Since 发请求，304 直接复用上次记录
+  2. 服务器不支持条件请求时，比较响应体哈希，内容没变同样跳过解析
+价格不变的绝大多数运行里，既省流量也省解析 CPU。
+校验信息和记录分两个文件存，可能对不上（记录文件丢了、读不出来）：
+没有任何记录的校验信息载入时直接丢弃；调用方传了 key 而上次的记录里没有它时，
+304 之后立即发一次普通请求拿完整内容，不会带着同样的 If-None-Match 一直空手而归。
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from scraper import fetch, metrics, records
+
+STORE_FILE   = Path("data/http_validators.json")
+RECORDS_FILE = Path("data/http_records.bin")
+
+_lock  = threading.Lock()
+_store: dict | None = None   # url[ #variant] → {"etag", "last_modified", "hash", "records": {key: record}}
+_seen:  dict = {}            # 本次运行中各 URL 最新 200 响应的校验信息
+_dirty = False
+
+
+def get(store: str, url: str, *, headers: dict, revalidate: bool = True,
+        variant: str = "", key: str | None = None, **kwargs):
+    """
+    发送（条件）GET，返回 (resp, records)。
+    records 非 None 表示内容与上次相同，可直接复用其中的记录；
+    revalidate=False 时发普通请求（需要完整内容时用）。
+    key：调用方要从 records 里取的键；上次没记下它时，返回的一定是完整内容（records 为 None）。
+    同一 URL 按 variant（如分店）分别记录校验信息，remember 时要传同一个 variant。
+    """
+    slot = _slot(url, variant)
+    with _lock:
+        entry = _entries().get(slot) if revalidate else None
+    h = dict(headers)
+    if entry:
+        if entry.get("etag"):
+            h["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            h["If-Modified-Since"] = entry["last_modified"]
+
+    resp = fetch.get(store, url, headers=h, variant=variant, **kwargs)
+    if entry and resp.status_code == 304:
+        if key is not None and key not in entry["records"]:
+            # 内容没变，但上次的记录不在了：304 没有正文，只能再要一次完整内容
+            metrics.inc("conditional_total", store=store, outcome="records_missing")
+            return get(store, url, headers=headers, revalidate=False, variant=variant, **kwargs)
+        metrics.inc("conditional_total", store=store, outcome="not_modified")
+        return resp, entry["records"]
+    if resp.status_code == 200:
+        digest = hashlib.sha1(resp.content).hexdigest()
+        with _lock:
+            _seen[slot] = {
+                "etag":          resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "hash":          digest,
+            }
+        if entry and entry.get("hash") == digest and (key is None or key in entry["records"]):
+            metrics.inc("conditional_total", store=store, outcome="same_hash")
+            return resp, entry["records"]
+    metrics.inc("conditional_total", store=store, outcome="changed")
+    return resp, None
+
+
+def remember(url: str, key: str, record: dict, variant: str = ""):
+    """把从 url 最新内容解析出的记录存到 key 下；内容变了则清空旧记录"""
+    global _dirty
+    slot = _slot(url, variant)
+    with _lock:
+        entries = _entries()
+        seen    = _seen.get(slot)
+        entry   = entries.get(slot)
+        if seen and (entry is None or entry.get("hash") != seen["hash"]):
+            entry = entries[slot] = {**seen, "records": {}}
+        if entry is None:
+            return
+        entry["records"][key] = record
+        _dirty = True
+
+
+def save():
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        STORE_FILE.parent.mkdir(exist_ok=True)
+        validators = {slot: {k: v for k, v in e.items() if k != "records"} for slot, e in _store.items()}
+        STORE_FILE.write_text(json.dumps(validators, ensure_ascii=False), encoding="utf-8")
+        RECORDS_FILE.write_bytes(records.dumps(
+            {(slot, key): r for slot, e in _store.items() for key, r in e["records"].items() if r}
+        ))
+        _dirty = False
+
+
+def _slot(url: str, variant: str) -> str:
+    return f"{url} #{variant}" if variant else url
+
+
+def _entries() -> dict:
+    global _store
+    if _store is None:
+        try:
+            _store = json.loads(STORE_FILE.read_text(encoding="utf-8")) if STORE_FILE.exists() else {}
+            saved  = records.loads(RECORDS_FILE.read_bytes()) if RECORDS_FILE.exists() else {}
+        except Exception:
+            _store, saved = {}, {}
+        for entry in _store.values():
+            # 旧版把记录直接存在 JSON 里
+            entry["records"] = {k: records.Record.from_dict(r) for k, r in entry.get("records", {}).items() if r}
+        for (slot, key), r in saved.items():
+            if slot in _store:
+                _store[slot]["records"][key] = r
+        # remember 只在有记录时才建条目：没有记录的说明记录文件丢了，校验信息也不能再用
+        for slot in [s for s, e in _store.items() if not e["records"]]:
+            del _store[slot]
+    return _store
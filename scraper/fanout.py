@@ -0,0 +1,111 @@
+"""
+多分店扇出 — 同一份 watchlist 在 N 个分店各抓一遍
+
+每家零售商一条通道（并行），通道内按分店依次抓：
+  - 同一零售商的所有分店共用一个会话（scraper.sessions）和一个限速器，
+    并行抓同一家的多个分店并不会更快，只会更容易被拦
+  - 每个分店内查询键按商品去重，整批交给后端的 get_prices
+  - 全国统一价的零售商（ALDI）只抓一次，结果复制给所有分店
+结果是扁平快照 {(item, 零售商, 分店名): record}。
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
+
+from scraper import metrics, registry
+from scraper.branches import Branch
+from scraper.watchlist import Item
+
+Key = tuple[str, str, str]   # (item, 零售商, 分店名)
+
+
+def lanes(watchlist: list[Item], plan: dict | None = None):
+    """
+    [(后端, [(watchlist 序号, 查询键)])]，只含至少有一个商品的门店；
+    plan={零售商: 序号集合} 时只保留选中的。同一批量分组（如 ALDI 同一分类页）的查询排在一起。
+    """
+    jobs = {}
+    for idx, item in enumerate(watchlist):
+        for job in item.jobs:
+            if plan is None or idx in plan.get(job.store, ()):
+                jobs.setdefault(job.store, []).append((job.group, idx, job.key))
+    return [(b, [(idx, key) for _, idx, key in sorted(jobs[b.store], key=lambda j: j[0])])
+            for b in registry.BACKENDS if b.store in jobs]
+
+
+def fan_out(watchlist: list[Item], branches: dict[str, list[Branch]],
+            on_branch=None, plan: dict | None = None) -> dict[Key, dict]:
+    """
+    on_branch(store, {item: record})：某个分店抓完时回调（在调用线程里），
+    records 里的 branch 字段区分分店。
+    """
+    work = [(b, branches[b.store], jobs) for b, jobs in lanes(watchlist, plan) if branches.get(b.store)]
+    results: dict[str, list[tuple[Branch, dict[int, dict]]]] = {}
+    with ThreadPoolExecutor(max_workers=max(len(work), 1), thread_name_prefix="lane") as pool:
+        futures = {pool.submit(_run_lane, watchlist, *w): w[0].store for w in work}
+        for f in as_completed(futures):
+            store = futures[f]
+            results[store] = f.result()
+            if on_branch:
+                for _, found in results[store]:
+                    on_branch(store, {watchlist[i].name: r for i, r in found.items()})
+
+    # 按 watchlist 顺序、零售商顺序、分店顺序组装
+    snapshot = {}
+    for idx, item in enumerate(watchlist):
+        for backend, _, _ in work:
+            for branch, found in results[backend.store]:
+                if idx in found:
+                    snapshot[(item.name, backend.store, branch.name)] = found[idx]
+    return snapshot
+
+
+def _run_lane(watchlist, backend, branches, jobs) -> list[tuple[Branch, dict[int, dict]]]:
+    keys  = list(dict.fromkeys(key for _, key in jobs))
+    multi = len(branches) > 1
+    out   = []
+    shared = backend.get_prices(keys, branches[0]) if backend.national else None
+    for branch in branches:
+        if shared is None:
+            found = backend.get_prices(keys, branch)
+        else:
+            found = {k: r and r.with_branch(branch.name) for k, r in shared.items()}
+        out.append((branch, _report(watchlist, backend, branch if multi else None, jobs, found)))
+    return out
+
+
+def _report(watchlist, backend, branch, jobs, found) -> dict[int, dict]:
+    store, label = backend.store, backend.label
+    at  = f" @{branch.name}" if branch else ""
+    out = {}
+    for idx, key in jobs:
+        name = watchlist[idx].name
+        r = found.get(key)
+        metrics.inc("items_total", store=store, outcome="ok" if r else "missing")
+        if r:
+            out[idx] = r
+            tag = f"{'🏷️' if r.get('on_special') else ''}  ({r['source']})" if store != "ALDI" else ""
+            print(f"    {label} {name}{at} ${r['price']:.2f}{tag}")
+        else:
+            print(f"    {label} {name}{at} ❌ 无法获取")
+    return out
+
+
+# ── 快照形状转换 ─────────────────────────────────────────────────────────────
+
+def observations(snapshot: dict[Key, dict]) -> Iterator[tuple[str, str, dict]]:
+    """扁平快照 → (item, store, record) 观测流（分店在 record["branch"] 里）"""
+    for (item, store, _), r in snapshot.items():
+        if r:
+            yield item, store, r
+
+
+def nest(snapshot: dict[Key, dict], by_branch: bool = False, items=()) -> dict:
+    """
+    扁平快照 → {item: {store: record}}。
+    by_branch=True 时第二层键为 "门店 分店名"，多分店的记录不会互相覆盖（用于日报）。
+    items：watchlist 商品名，按这个顺序排，一家都没抓到的商品也留一个空 {}（日报显示"暂无数据"）。
+    """
+    out = {name: {} for name in items}
+    for (item, store, branch), r in snapshot.items():
+        out.setdefault(item, {})[f"{store} {branch}" if by_branch else store] = r
+    return out
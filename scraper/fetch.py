@@ -0,0 +1,90 @@
+"""
+HTTP 出口 — 三家 scraper 的每个请求都经过这里
+
+先查跨运行的响应缓存（scraper.cache），未命中才用该门店的共享会话
+（scraper.sessions）发请求，按门店限速（scraper.throttle），
+并记录请求数、状态码、下载字节和耗时（scraper.metrics）。
+每个请求的结果交给 scraper.breaker：主机熔断时直接抛 breaker.CircuitOpen 不发请求，
+可重试的失败（超时、429、502–504）退避后重试一次，超时按主机最近的耗时收紧。
+stream() 供只需要读到某处就能停的场景（如 Coles 的 URL 发现）：边下边解码，
+调用方停止迭代时连接随即关闭，剩余内容不再下载；流式请求不走响应缓存。
+"""
+import codecs
+import time
+
+from scraper import breaker, cache, metrics, sessions, throttle
+
+
+def get(store: str, url: str, *, variant: str = "", **kwargs):
+    """variant 只参与缓存键（见 scraper.cache.key），不影响请求本身"""
+    params = kwargs.get("params")
+    if (hit := cache.lookup(store, url, params, variant)) is not None:
+        return hit
+    session = sessions.get(store)
+    for retry in (False, True):
+        resp, again = _send(store, session, url, retry, **kwargs)
+        if not again:
+            break
+        metrics.inc("http_retries_total", store=store)
+    cache.put(store, url, params, resp, variant)
+    return resp
+
+
+def _send(store, session, url, last: bool, **kwargs):
+    """发一次请求：(响应, 是否该重试)；异常在不该重试时原样抛出"""
+    breaker.check(url)
+    throttle.wait(store)
+    kwargs["timeout"] = breaker.timeout(url, kwargs.get("timeout"))
+    t = time.perf_counter()
+    try:
+        resp = session.get(url, **kwargs)
+    except Exception as e:
+        elapsed = time.perf_counter() - t
+        metrics.inc("http_requests_total", store=store, status="error")
+        metrics.observe("http_request_seconds", elapsed, store=store)
+        if breaker.record(store, url, None, elapsed, timed_out=_is_timeout(e)) and not last:
+            return None, True
+        raise
+    elapsed = time.perf_counter() - t
+    metrics.observe("http_request_seconds", elapsed, store=store)
+    metrics.inc("http_requests_total", store=store, status=str(resp.status_code))
+    metrics.inc("http_response_bytes_total", len(resp.content), store=store)
+    again = breaker.record(store, url, resp.status_code, elapsed, resp.headers.get("Retry-After"))
+    return resp, again and not last
+
+
+def _is_timeout(e: Exception) -> bool:
+    from requests.exceptions import Timeout   # 能走到这里，会话早已 import 过 requests
+    return isinstance(e, Timeout)
+
+
+def stream(store: str, url: str, chunk_size: int = 16384, **kwargs):
+    """流式 GET：逐块产出解码后的文本（不重试）"""
+    session = sessions.get(store)
+    breaker.check(url)
+    throttle.wait(store)
+    kwargs["timeout"] = breaker.timeout(url, kwargs.get("timeout"))
+    t = time.perf_counter()
+    try:
+        resp = session.get(url, stream=True, **kwargs)
+    except Exception as e:
+        elapsed = time.perf_counter() - t
+        metrics.inc("http_requests_total", store=store, status="error")
+        metrics.observe("http_request_seconds", elapsed, store=store)
+        breaker.record(store, url, None, elapsed, timed_out=_is_timeout(e))
+        raise
+    breaker.record(store, url, resp.status_code, time.perf_counter() - t, resp.headers.get("Retry-After"))
+    metrics.inc("http_requests_total", store=store, status=str(resp.status_code))
+    decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")(errors="replace")
+    size = 0
+    try:
+        for chunk in resp.iter_content(chunk_size):
+            size += len(chunk)
+            if text := decoder.decode(chunk):
+                yield text
+        if tail := decoder.decode(b"", final=True):
+            yield tail
+    finally:
+        resp.close()
+        metrics.inc("http_response_bytes_total", size, store=store)
+        metrics.observe("http_request_seconds", time.perf_counter() - t, store=store)
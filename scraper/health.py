@@ -0,0 +1,89 @@
+"""
+端点健康记录 — 按 (base URL, storeId) 记连续失败，跨运行持久化
+
+只有"端点本身出错"（HTTP 错误、异常、返回结构不对）才记失败；
+查询正常返回但没有搜到商品记成功，不会因此触发重新发现。
+同一个 base URL 下不同 storeId 的组合（不带 storeId 记为 "-"）各自计数，
+另有一条 storeId="*" 的汇总：
+  failing(base)          base 连续失败达到阈值（跨多个查询）→ 该重新发现了
+  skip(base, store_id)   这个 storeId 组合连续失败、且还在冷却期内 → 直接跳过
+只存正在失败的组合（连续失败次数 + 最后失败时间），成功即删除：
+端点一直正常时文件内容不变，不会每次运行都产生一个提交。
+线程安全，多个并发的抓取通道共用同一份记录。
+"""
+import json
+import threading
+import time
+from pathlib import Path
+
+ANY = "*"
+
+
+class EndpointHealth:
+    def __init__(self, path: Path, threshold: int = 3, cooldown: float = 6 * 3600):
+        self.path      = path
+        self.threshold = threshold   # 连续失败几次算不健康
+        self.cooldown  = cooldown    # 不健康的组合冷却多久后再试（秒）
+        self._lock     = threading.Lock()
+        self._stats: dict | None = None
+        self._dirty    = False
+
+    def record(self, base: str, store_id: str | None, ok: bool):
+        now = time.time()
+        with self._lock:
+            stats = self._load()
+            for key in {_key(base, store_id), _key(base, ANY)}:
+                if ok:
+                    if stats.pop(key, None) is not None:
+                        self._dirty = True
+                    continue
+                s = stats.setdefault(key, {"streak": 0, "last_fail": None})
+                s["streak"] += 1
+                s["last_fail"] = now
+                self._dirty = True
+
+    def failing(self, base: str) -> bool:
+        return self._streak(base, ANY) >= self.threshold
+
+    def skip(self, base: str, store_id: str | None) -> bool:
+        with self._lock:
+            s = self._load().get(_key(base, store_id))
+        return bool(s and s["streak"] >= self.threshold
+                    and time.time() - (s["last_fail"] or 0) < self.cooldown)
+
+    def reset(self, base: str):
+        """重新发现后旧 base 的记录作废"""
+        with self._lock:
+            stats = self._load()
+            for key in [k for k in stats if k.split(" ", 1)[0] == base]:
+                del stats[key]
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(exist_ok=True)
+            self.path.write_text(json.dumps(self._stats, indent=2), encoding="utf-8")
+            self._dirty = False
+
+    def _streak(self, base: str, store_id: str | None) -> int:
+        with self._lock:
+            s = self._load().get(_key(base, store_id))
+        return s["streak"] if s else 0
+
+    def _load(self) -> dict:
+        if self._stats is None:
+            try:
+                self._stats = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+            except Exception:
+                self._stats = {}
+            # 旧版连同成功计数一起存：连续失败为 0 的条目丢掉，下次保存时收缩
+            for key in [k for k, s in self._stats.items() if not s.get("streak")]:
+                del self._stats[key]
+                self._dirty = True
+        return self._stats
+
+
+def _key(base: str, store_id: str | None) -> str:
+    return f"{base} {store_id or '-'}"   # "-" 为不带 storeId 的请求
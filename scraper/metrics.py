@@ -0,0 +1,146 @@
+"""
+运行指标 — 计数器、直方图、计时 span
+
+全部放在进程内存里，线程安全；一次运行结束时由 monitor.py 导出：
+  data/metrics.json  机器可读的完整报告（含分位数）
+  data/metrics.prom  Prometheus 文本格式，可交给 node_exporter textfile collector
+
+指标名约定：
+  http_requests_total{store,status}      每个 HTTP 请求
+  http_response_bytes_total{store}       下载字节数
+  http_request_seconds{store}            请求耗时
+  strategy_total{store,strategy,outcome} 各抓取策略 hit / miss / error
+  strategy_seconds{store,strategy}       各抓取策略耗时
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+JSON_FILE = Path("data/metrics.json")
+PROM_FILE = Path("data/metrics.prom")
+
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock       = threading.Lock()
+_counters:   dict[tuple, float]       = {}
+_histograms: dict[tuple, list[float]] = {}
+_started    = time.time()
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name: str, value: float = 1, **labels):
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + value
+
+
+def observe(name: str, value: float, **labels):
+    k = _key(name, labels)
+    with _lock:
+        _histograms.setdefault(k, []).append(value)
+
+
+@contextmanager
+def span(store: str, strategy: str):
+    """
+    给一个抓取策略计时并记录结果：
+        with metrics.span("Woolworths", "json_api") as s:
+            ...
+            s["hit"] = result is not None
+    抛异常记为 error，否则按 s["hit"] 记 hit / miss。
+    """
+    state = {"hit": False}
+    t = time.perf_counter()
+    try:
+        yield state
+    except Exception:
+        inc("strategy_total", store=store, strategy=strategy, outcome="error")
+        raise
+    else:
+        inc("strategy_total", store=store, strategy=strategy,
+            outcome="hit" if state["hit"] else "miss")
+    finally:
+        observe("strategy_seconds", time.perf_counter() - t, store=store, strategy=strategy)
+
+
+def timed(store: str, strategy: str, fn, *args, **kwargs):
+    """span 的函数版：调用 fn，返回值为真记 hit，否则记 miss"""
+    with span(store, strategy) as s:
+        result = fn(*args, **kwargs)
+        s["hit"] = bool(result)
+    return result
+
+
+def reset():
+    global _started
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _started = time.time()
+
+
+# ── 导出 ──────────────────────────────────────────────────────────────────────
+
+def report() -> dict:
+    with _lock:
+        counters   = dict(_counters)
+        histograms = {k: sorted(v) for k, v in _histograms.items()}
+    return {
+        "started":  _started,
+        "finished": time.time(),
+        "counters": [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(counters.items())
+        ],
+        "histograms": [
+            {"name": name, "labels": dict(labels), "count": len(v), "sum": sum(v),
+             "p50": _pct(v, 50), "p90": _pct(v, 90), "p99": _pct(v, 99), "max": v[-1]}
+            for (name, labels), v in sorted(histograms.items())
+        ],
+    }
+
+
+def prometheus_text() -> str:
+    with _lock:
+        counters   = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    lines, typed = [], set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_labels(labels)} {value:g}")
+    for (name, labels), values in sorted(histograms.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for le in BUCKETS:
+            n = sum(1 for v in values if v <= le)
+            lines.append(f"{name}_bucket{_labels(labels + (('le', f'{le:g}'),))} {n}")
+        lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {len(values)}")
+        lines.append(f"{name}_sum{_labels(labels)} {sum(values):.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {len(values)}")
+    return "\n".join(lines) + "\n"
+
+
+def write():
+    JSON_FILE.parent.mkdir(exist_ok=True)
+    JSON_FILE.write_text(json.dumps(report(), indent=2, ensure_ascii=False), encoding="utf-8")
+    PROM_FILE.write_text(prometheus_text(), encoding="utf-8")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+def _pct(sorted_values: list[float], pct: float) -> float:
+    k = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[k]
@@ -1,58 +1,188 @@
+"""
+Telegram 通知
+
+- 复用同一个连接池 Session（scraper.sessions.telegram，首次发送时才创建）
+- 超过 4096 字符的消息按条目边界拆成多条（续行以空格开头，不会被拆开）
+- 429 时按 retry_after 等待重试，网络错误 / 5xx 指数退避
+- Outbox：后台线程逐条发送，抓取还没结束时先完成的门店就能先发出提醒
+"""
 import os
-import requests
+import queue
+import threading
+import time
+
+from scraper import sessions
+from scraper.throttle import Throttle
+
+API_URL     = "https://api.telegram.org"
+MAX_LEN     = 4096
+MAX_RETRIES = 4
+
+_pace = Throttle(1.0, 1.0)   # 同一个聊天每秒最多一条
 
 
 def send(text: str) -> bool:
+    """同步发送；长消息自动拆分，全部发出才返回 True"""
+    return all([_send_one(chunk) for chunk in split_message(text)])
+
+
+def split_message(text: str, limit: int = MAX_LEN) -> list[str]:
+    """在条目边界（不以空格开头的行）处把消息切成不超过 limit 的若干段"""
+    blocks = []
+    for line in text.split("\n"):
+        if blocks and line.startswith(" "):
+            blocks[-1] += "\n" + line
+        else:
+            blocks.append(line)
+
+    chunks, cur = [], ""
+    for block in blocks:
+        while len(block) > limit:   # 单个条目本身就超长，只能硬切
+            if cur:
+                chunks.append(cur)
+                cur = ""
+            chunks.append(block[:limit])
+            block = block[limit:]
+        if cur and len(cur) + 1 + len(block) > limit:
+            chunks.append(cur)
+            cur = block
+        else:
+            cur = f"{cur}\n{block}" if cur else block
+    if cur.strip():
+        chunks.append(cur)
+    return chunks
+
+
+def _send_one(text: str) -> bool:
     token   = os.environ["TELEGRAM_BOT_TOKEN"]
     chat_id = os.environ["TELEGRAM_CHAT_ID"]
+    delay = 1.0
+    for attempt in range(MAX_RETRIES + 1):
+        _pace.wait()
+        try:
+            r = sessions.telegram().post(
+                f"{API_URL}/bot{token}/sendMessage",
+                json={
+                    "chat_id":                  chat_id,
+                    "text":                     text,
+                    "parse_mode":               "Markdown",
+                    "disable_web_page_preview": True,
+                },
+                timeout=10,
+            )
+            if r.status_code == 429:
+                wait = _retry_after(r, delay)
+                print(f"  [Telegram] 被限流，{wait:.0f}s 后重试")
+                time.sleep(wait)
+                continue
+            if r.status_code < 500:
+                if r.status_code >= 400:
+                    print(f"  [Telegram] 发送失败: HTTP {r.status_code}")
+                    return False
+                return True
+            err = f"HTTP {r.status_code}"
+        except Exception as e:
+            err = e
+        if attempt < MAX_RETRIES:
+            time.sleep(delay)
+            delay *= 2
+    print(f"  [Telegram] 发送失败: {err}")
+    return False
+
+
+def _retry_after(resp, default: float) -> float:
     try:
-        r = requests.post(
-            f"https://api.telegram.org/bot{token}/sendMessage",
-            json={
-                "chat_id":                  chat_id,
-                "text":                     text,
-                "parse_mode":               "Markdown",
-                "disable_web_page_preview": True,
-            },
-            timeout=10,
-        )
-        r.raise_for_status()
-        return True
-    except Exception as e:
-        print(f"  [Telegram] 发送失败: {e}")
-        return False
+        return float(resp.json()["parameters"]["retry_after"])
+    except Exception:
+        return float(resp.headers.get("Retry-After", default))
+
+
+class Outbox:
+    """
+    后台发送队列：put() 立即返回，消息由工作线程按顺序发出；
+    close() 等待队列清空后返回，结果为是否全部发送成功。
+    """
+
+    def __init__(self):
+        self._queue  = queue.Queue()
+        self._ok     = True
+        self._thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+        self._thread.start()
+
+    def put(self, text: str):
+        self._queue.put(text)
+
+    def close(self) -> bool:
+        self._queue.put(None)
+        self._thread.join()
+        return self._ok
+
+    def _run(self):
+        while (text := self._queue.get()) is not None:
+            try:
+                self._ok &= send(text)
+            except Exception as e:
+                print(f"  [Telegram] 发送失败: {e}")
+                self._ok = False
+
+
+_BASELINE_SECTIONS = [
+    ("low",   "🏆 *历史新低*"),
+    ("low90", "📉 *90 天新低*"),
+    ("below", "📉 *低于平时价格*"),
+]
+
+
+def _off(a) -> float:
+    """比基线便宜的比例；基线为 0 或缺失（价格解析出错存进去的）按 0 算"""
+    return (a.baseline - a.new_price) / a.baseline if a.baseline and a.baseline > 0 else 0.0
 
 
 def price_change_message(alerts: list) -> str:
-    drops = sorted([a for a in alerts if a["change"] < 0], key=lambda x: x["change"])
-    rises = sorted([a for a in alerts if a["change"] > 0], key=lambda x: -x["change"])
+    changes = [a for a in alerts if a.kind in ("change", "new") and a.change is not None]
+    drops = sorted([a for a in changes if a.change < 0], key=lambda x: x.change)
+    rises = sorted([a for a in changes if a.change > 0], key=lambda x: -x.change)
     lines = ["🛒 *Carnegie 3163 价格变动*\n"]
 
+    for kind, title in _BASELINE_SECTIONS:
+        found = sorted([a for a in alerts if a.kind == kind], key=_off, reverse=True)
+        if not found:
+            continue
+        lines.append(title)
+        for a in found:
+            tag = " 🏷️特价" if a.on_special else ""
+            off = _off(a) * 100
+            lines.append(
+                f"• *{a.item}* — {a.store} {a.branch}\n"
+                f"  *${a.new_price:.2f}*  平时 ${a.baseline or 0:.2f}（-{off:.0f}%{tag}）"
+            )
+        lines.append("")
+
     if drops:
         lines.append("📉 *降价*")
         for a in drops:
-            pct = abs(a["change"] / a["old_price"] * 100)
-            tag = " 🏷️特价" if a.get("on_special") else ""
+            tag = " 🏷️特价" if a.on_special else ""
             lines.append(
-                f"• *{a['item']}* — {a['store']} {a['branch']}\n"
-                f"  ~~${a['old_price']:.2f}~~ → *${a['new_price']:.2f}*"
-                f"  (-${abs(a['change']):.2f} / -{pct:.0f}%{tag})"
+                f"• *{a.item}* — {a.store} {a.branch}\n"
+                f"  ~~${a.old_price:.2f}~~ → *${a.new_price:.2f}*"
+                f"  (-${abs(a.change):.2f} / -{abs(a.pct):.0f}%{tag})"
             )
         lines.append("")
 
     if rises:
         lines.append("📈 *涨价*")
         for a in rises:
-            pct = a["change"] / a["old_price"] * 100
             lines.append(
-                f"• *{a['item']}* — {a['store']} {a['branch']}\n"
-                f"  ~~${a['old_price']:.2f}~~ → *${a['new_price']:.2f}*"
-                f"  (+${a['change']:.2f} / +{pct:.0f}%)"
+                f"• *{a.item}* — {a.store} {a.branch}\n"
+                f"  ~~${a.old_price:.2f}~~ → *${a.new_price:.2f}*"
+                f"  (+${a.change:.2f} / +{a.pct:.0f}%)"
             )
     return "\n".join(lines)
 
 
-def daily_summary_message(prices: dict) -> str:
+def daily_summary_message(prices: dict, insights: dict | None = None) -> str:
+    """insights：analytics.insights() 的结果，附上窗口内最低价和整篮总价"""
+    lows = (insights or {}).get("items", {})
     lines = [
         "📊 *Carnegie 3163 每日价格*",
         "📍 Woolworths #3298 | Coles Carnegie | ALDI\n",
@@ -70,4 +200,11 @@ def daily_summary_message(prices: dict) -> str:
         ]
         lines.append(f"*{item_name}*  最优 *${best_price:.2f}* ({best_store})")
         lines.append(f"  {' | '.join(parts)}")
+        if low := lows.get(item_name):
+            lines.append(f"  {insights['window_days']} 天最低 ${low['low']:.2f} ({low['low_store']})")
+    if insights and insights["basket"]["totals"]:
+        b = insights["basket"]
+        lines.append(f"\n🧺 *整篮总价*（{len(b['items'])} 个商品）")
+        lines += [f"  {store}: ${total:.2f}" for store, total in b["totals"]]
+        lines.append(f"  每样挑最便宜: ${b['cheapest_mix']:.2f}")
     return "\n".join(lines)
@@ -0,0 +1,130 @@
+"""
+价格记录 — 紧凑的记录类型和快照的二进制格式
+
+Record 是 __slots__ 记录，store / branch / source 这些反复出现的字符串全部 intern；
+大 watchlist × 多分店时每条记录不再是一个 8 键 dict。约定不原地修改，换分店用 with_branch。
+Record 实现 Mapping 接口（r["price"]、r.get(...)、dict(r)），按 dict 读记录的代码不用改；
+键名和顺序与原来各 scraper 的 _build 一致：单位价 Woolworths 叫 unit_price，
+Coles 叫 unit，ALDI 没有。
+
+快照二进制格式（dumps / loads），键是定长的字符串元组：
+  "SNAP1" | 键元数 | 字符串数 | 字符串表长度 | 字符串表（\\0 分隔，去重）| 定长行
+每行只有字符串下标、两个 double（None 存为 NaN）和一个标志字节。
+to_json 导出旧版 prices.json 的嵌套格式，供兼容使用。
+"""
+import json
+import struct
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+
+UNIT_KEYS = {"Woolworths": "unit_price", "Coles": "unit"}   # 各门店单位价字段的键名
+
+_MAGIC  = b"SNAP1"
+_HEADER = struct.Struct("<5sBII")
+_NAN    = float("nan")
+
+
+@dataclass(slots=True, eq=False)
+class Record(Mapping):
+    store:      str
+    branch:     str
+    name:       str
+    price:      float | None
+    was_price:  float | None = None
+    unit:       str          = ""
+    on_special: bool         = False
+    source:     str          = ""
+
+    def __post_init__(self):
+        self.store  = sys.intern(self.store or "")
+        self.branch = sys.intern(self.branch or "")
+        self.source = sys.intern(self.source or "")
+
+    def with_branch(self, branch: str) -> "Record":
+        return self if branch == self.branch else replace(self, branch=branch)
+
+    # ── Mapping：与原来的 dict 记录同样的键 ─────────────────────────────────
+
+    def __getitem__(self, key: str):
+        if key == UNIT_KEYS.get(self.store):
+            return self.unit
+        if key == "unit" or key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(_keys(self.store))
+
+    def __len__(self) -> int:
+        return len(_keys(self.store))
+
+    def __repr__(self) -> str:
+        return f"Record({dict(self)!r})"
+
+    @classmethod
+    def from_dict(cls, d: Mapping) -> "Record":
+        if isinstance(d, Record):
+            return d
+        store = d.get("store") or ""
+        return cls(store, d.get("branch") or "", d.get("name") or "", d.get("price"),
+                   d.get("was_price"), d.get(UNIT_KEYS.get(store, "unit")) or "",
+                   bool(d.get("on_special")), d.get("source") or "")
+
+
+_FIELDS = ("store", "branch", "name", "price", "was_price", "unit", "on_special", "source")
+_KEYS   = {}
+
+
+def _keys(store: str) -> tuple[str, ...]:
+    if (keys := _KEYS.get(store)) is None:
+        unit = UNIT_KEYS.get(store)
+        keys = _KEYS[store] = tuple(unit if f == "unit" else f for f in _FIELDS if f != "unit" or unit)
+    return keys
+
+
+# ── 二进制快照 ───────────────────────────────────────────────────────────────
+
+def dumps(snapshot: dict[tuple[str, ...], Mapping]) -> bytes:
+    """{(键…): record} → bytes；同一快照里键的元数必须相同"""
+    strings: dict[str, int] = {}
+    sid   = lambda s: strings.setdefault(s or "", len(strings))
+    arity = len(next(iter(snapshot))) if snapshot else 0
+    row   = _row(arity)
+    body  = bytearray()
+    for key, r in snapshot.items():
+        if len(key) != arity:
+            raise ValueError(f"快照键的元数不一致: {key!r} 不是 {arity} 元")
+        r = Record.from_dict(r)
+        body += row.pack(*map(sid, key), sid(r.store), sid(r.branch), sid(r.name), sid(r.unit),
+                         sid(r.source), _NAN if r.price is None else r.price,
+                         _NAN if r.was_price is None else r.was_price, r.on_special)
+    table = "\0".join(strings).encode("utf-8")
+    return _HEADER.pack(_MAGIC, arity, len(strings), len(table)) + table + body
+
+
+def loads(data: bytes) -> dict[tuple[str, ...], Record]:
+    magic, arity, count, size = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("不是快照文件")
+    start   = _HEADER.size
+    strings = data[start:start + size].decode("utf-8").split("\0") if count else []
+    out = {}
+    for *key, store, branch, name, unit, source, price, was, special in \
+            _row(arity).iter_unpack(memoryview(data)[start + size:]):
+        out[tuple([strings[k] for k in key])] = Record(
+            strings[store], strings[branch], strings[name],
+            price if price == price else None, was if was == was else None,   # NaN → None
+            strings[unit], special, strings[source],
+        )
+    return out
+
+
+def _row(arity: int) -> struct.Struct:
+    return struct.Struct(f"<{arity + 5}I2d?")
+
+
+def to_json(snapshot: dict) -> str:
+    """{item: {store: record}} → 旧版 prices.json 格式"""
+    return json.dumps({item: {store: r and dict(r) for store, r in stores.items()}
+                       for item, stores in snapshot.items()}, indent=2, ensure_ascii=False)
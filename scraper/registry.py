@@ -0,0 +1,42 @@
+"""
+爬虫注册表 — watchlist 字段 → 门店后端
+
+后端模块按需 import：watchlist 里没有 coles_query 的运行不会加载 Coles，
+没有 ALDI 商品的运行也不会加载 BeautifulSoup。
+每个后端模块都提供批量接口 get_prices(keys, branch=None) -> {key: record | None}。
+"""
+import importlib
+import sys
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class Backend:
+    store:    str
+    module:   str
+    field:    str                 # watchlist 里的查询键字段
+    label:    str                 # 日志前缀
+    gate:     str | None = None   # 还需要这个字段为真才抓（ALDI 的 monitor_aldi）
+    national: bool = False        # 全国统一价：多个分店只抓一次
+
+    @property
+    def get_prices(self):
+        return importlib.import_module(self.module).get_prices
+
+    @property
+    def loaded(self):
+        """已经 import 过就返回模块，否则 None（不会触发加载）"""
+        return sys.modules.get(self.module)
+
+
+# 顺序即快照里的门店顺序
+BACKENDS = (
+    Backend("Woolworths", "scraper.woolworths", "woolworths_id", "WW:   "),
+    Backend("Coles",      "scraper.coles",      "coles_query",   "Coles:"),
+    Backend("ALDI",       "scraper.aldi",       "aldi_keyword",  "ALDI: ", gate="monitor_aldi", national=True),
+)
+
+
+def backend(store: str) -> Backend:
+    return next(b for b in BACKENDS if b.store == store)
+
@@ -0,0 +1,121 @@
+"""
+商品识别 — 模糊查询 → 稳定的 product ID
+
+模糊搜索只在第一次（或 ID 失效时）做：候选商品按下面的规则打分，取最高分的那个，
+把它的 ID 存下来（Identities），之后的运行按 ID 直取，不会悄悄换成另一个商品。
+  词重合   查询词在候选文本里出现的比例（0–1）
+  规格     双方都写了容量 / 重量（2L、700g）或件数（12 Pack、6 x 375ml）时，
+           一致 +0.25，不一致 -0.5
+分数低于 MIN_SCORE 的候选不要，宁可报"没找到"也不乱配。
+"""
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+MIN_SCORE = 0.5
+
+_TOKEN_RE   = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_MEASURE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|g|ml|l|lt|litres?)\b")
+_PACK_RE    = re.compile(r"(\d+)\s*(?:pk|packs?|pieces|ea|each|ct)\b|\b(\d+)\s*x\s*\d")
+_MEASURE    = {"kg": ("g", 1000), "g": ("g", 1), "ml": ("ml", 1), "l": ("ml", 1000),
+               "lt": ("ml", 1000), "litre": ("ml", 1000), "litres": ("ml", 1000)}
+
+
+@dataclass(frozen=True, slots=True)
+class Terms:
+    tokens:  frozenset
+    measure: tuple[float, str] | None   # 统一到 g / ml
+    pack:    int | None
+
+
+def terms(text: str) -> Terms:
+    text = (text or "").lower()
+    measure = None
+    if m := _MEASURE_RE.search(text):
+        unit, scale = _MEASURE[m.group(2)]
+        measure = (float(m.group(1)) * scale, unit)
+    pack = None
+    if m := _PACK_RE.search(text):
+        pack = int(m.group(1) or m.group(2))
+    return Terms(frozenset(_TOKEN_RE.findall(text)), measure, pack)
+
+
+def score(query: Terms, cand: Terms) -> float:
+    if not query.tokens:
+        return 0.0
+    s = len(query.tokens & cand.tokens) / len(query.tokens)
+    if query.measure and cand.measure:
+        same = query.measure[1] == cand.measure[1] and abs(query.measure[0] - cand.measure[0]) < 1e-6
+        s += 0.25 if same else -0.5
+    if query.pack and cand.pack:
+        s += 0.25 if query.pack == cand.pack else -0.5
+    return s
+
+
+def best(query: Terms, cands: Iterable[tuple[object, Terms]]):
+    """(候选键, 分数)，同分取先出现的；都低于 MIN_SCORE 返回 None"""
+    top, top_score = None, MIN_SCORE
+    for key, t in cands:
+        if (s := score(query, t)) > top_score or (top is None and s >= top_score):
+            top, top_score = key, s
+    return None if top is None else (top, top_score)
+
+
+# ── 已确认的 query → product ID ───────────────────────────────────────────────
+
+class Identities:
+    """
+    {查询: {"id", "name", "score", "resolved"}}，跨运行持久化（各门店一个文件）。
+    线程安全；set / drop 之后调用 save() 才写盘。
+    """
+
+    def __init__(self, path: Path):
+        self.path   = path
+        self._lock  = threading.Lock()
+        self._ids: dict | None = None
+        self._dirty = False
+
+    def get(self, query: str) -> str | None:
+        with self._lock:
+            entry = self._load().get(query)
+        return entry and entry["id"]
+
+    def set(self, query: str, product_id: str, name: str | None = None, score: float | None = None):
+        with self._lock:
+            ids = self._load()
+            if (ids.get(query) or {}).get("id") == product_id:
+                return
+            ids[query] = {"id": product_id, "name": name,
+                          "score": score if score is None else round(score, 3),
+                          "resolved": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            self._dirty = True
+
+    def drop(self, query: str):
+        """ID 失效（下架、换了链接）：下次重新模糊匹配"""
+        with self._lock:
+            if self._load().pop(query, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(exist_ok=True)
+            self.path.write_text(json.dumps(self._ids, indent=2, ensure_ascii=False), encoding="utf-8")
+            self._dirty = False
+
+    def _load(self) -> dict:
+        if self._ids is None:
+            try:
+                raw = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+            except Exception:
+                raw = {}
+            # 旧版文件是 {查询: product ID}
+            self._ids = {q: v if isinstance(v, dict) else {"id": str(v), "name": None, "score": None,
+                                                            "resolved": None}
+                         for q, v in raw.items()}
+        return self._ids
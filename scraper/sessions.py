@@ -0,0 +1,42 @@
+"""
+HTTP 会话工厂 — 所有出站请求从这里拿会话
+
+  get(store)   门店的 cloudscraper 会话
+  telegram()   Telegram Bot API 用的普通 requests 会话
+
+会话在第一次请求时才创建（连 cloudscraper / requests 本身也是那时才 import），
+只抓一家店时另外两家的会话和握手完全不会发生。
+每家店一个会话：各自复用 keep-alive 连接池，并发通道之间也不会共享
+cloudscraper 的挑战状态。
+"""
+import threading
+
+BROWSER = {"browser": "chrome", "platform": "darwin", "mobile": False}
+
+_lock     = threading.Lock()
+_sessions = {}
+
+
+def get(store: str):
+    session = _sessions.get(store)
+    if session is None:
+        with _lock:
+            session = _sessions.get(store)
+            if session is None:
+                import cloudscraper
+                session = _sessions[store] = cloudscraper.create_scraper(browser=BROWSER)
+    return session
+
+
+def telegram():
+    session = _sessions.get("Telegram")
+    if session is None:
+        with _lock:
+            session = _sessions.get("Telegram")
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+                _sessions["Telegram"] = session
+    return session
@@ -0,0 +1,70 @@
+"""
+按门店限速 — 每家超市一条独立的礼貌间隔
+
+三家店各自一把锁、各自一个"下次可请求时间"，同一门店的请求串行排队，
+不同门店之间互不等待。
+自适应退避（由 scraper.breaker 驱动）：失败后 defer 推迟下一个请求，
+响应变慢时 slow_down 把间隔放大（最多 MAX_SCALE 倍），正常后 recover 逐步缩回。
+"""
+import random
+import threading
+import time
+
+# 每家店两次请求之间的随机间隔（秒）
+LIMITS = {
+    "Woolworths": (1.0, 2.5),
+    "Coles":      (1.0, 2.5),
+    "ALDI":       (0.5, 1.5),
+}
+
+MAX_SCALE = 8.0
+
+
+class Throttle:
+    """相邻两次 wait() 之间至少间隔 uniform(lo, hi) 秒，线程安全。"""
+
+    def __init__(self, lo: float, hi: float):
+        self.lo, self.hi = lo, hi
+        self._lock = threading.Lock()
+        self._next = 0.0
+        self.scale = 1.0
+
+    def wait(self):
+        with self._lock:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next = time.monotonic() + random.uniform(self.lo, self.hi) * self.scale
+
+    def defer(self, seconds: float):
+        """下一个请求至少推迟到 seconds 秒之后"""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+_throttles = {store: Throttle(lo, hi) for store, (lo, hi) in LIMITS.items()}
+
+
+def wait(store: str):
+    """发请求前调用：必要时阻塞到该门店的礼貌间隔结束。"""
+    _throttles[store].wait()
+
+
+def defer(store: str, seconds: float):
+    _throttles[store].defer(seconds)
+
+
+def slow_down(store: str):
+    t = _throttles[store]
+    t.scale = min(t.scale * 2, MAX_SCALE)
+
+
+def recover(store: str):
+    t = _throttles[store]
+    if t.scale > 1.0:
+        t.scale = max(t.scale * 0.8, 1.0)
+
+
+def configure(store: str, lo: float, hi: float):
+    """调整某家店的间隔（基准测试对本地替身服务器时设为 0）。"""
+    _throttles[store] = Throttle(lo, hi)
@@ -0,0 +1,141 @@
+"""
+watchlist 编译 — watchlist.json 校验一次，解析成每家店的抓取计划
+
+每个商品编译成一个 Item：名字、提醒阈值、轮询间隔，以及每家店一个 Job（查询键 + 分组）。
+  - 格式错误（缺名字、重名、字段类型不对）直接抛 WatchlistError，不会跑到一半才出错
+  - 可疑但能跑的（未知字段、没有任何门店、ALDI 关键词找不到分类页）打印警告，
+    找不到分类页的 ALDI 关键词不生成 Job，而不是每次运行都静默地返回 None
+  - Job.group 是批量分组：ALDI 为分类页 URL（同一页的关键词排在一起抓），其余为 "bulk"
+编译结果按 (watchlist 内容, ALDI 分类表) 的哈希缓存到 data/watchlist_plan.json，
+内容没变时直接载入，不再逐项检查。
+"""
+import hashlib
+import json
+from dataclasses import astuple, dataclass
+from pathlib import Path
+
+from scraper import registry
+from scraper.changes import DEFAULT_BELOW, DEFAULT_THRESHOLD
+
+PLAN_FILE    = Path("data/watchlist_plan.json")
+PLAN_VERSION = 1   # Item / Job 结构变了就加一，旧缓存自动作废
+
+_KNOWN = {"name", "alert_threshold", "alert_below_pct", "poll_minutes"} | \
+         {b.field for b in registry.BACKENDS} | {b.gate for b in registry.BACKENDS if b.gate}
+
+
+class WatchlistError(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class Job:
+    store: str
+    key:   str
+    group: str
+
+
+@dataclass(slots=True)
+class Item:
+    name:         str
+    threshold:    float   # 相邻两次价格变动的提醒阈值（$）
+    below_pct:    float   # 跌破历史基线多少比例提醒
+    poll_minutes: float   # 常驻模式下单独指定的轮询间隔，0 表示按默认
+    jobs:         tuple[Job, ...]
+
+
+def load(path: Path) -> list[Item]:
+    data = path.read_bytes()
+    key  = _fingerprint(data)
+    try:
+        cached = json.loads(PLAN_FILE.read_text(encoding="utf-8")) if PLAN_FILE.exists() else {}
+    except Exception:
+        cached = {}
+    if cached.get("key") == key:
+        return [Item(name, t, b, p, tuple(Job(*j) for j in jobs)) for name, t, b, p, jobs in cached["items"]]
+
+    try:
+        raw = json.loads(data)
+    except json.JSONDecodeError as e:
+        raise WatchlistError(f"{path} 不是合法的 JSON: {e}") from None
+    items = compile_items(raw)
+    PLAN_FILE.parent.mkdir(exist_ok=True)
+    PLAN_FILE.write_text(json.dumps({"key": key, "items": [astuple(it) for it in items]},
+                                    ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    print(f"  [watchlist] 已编译 {len(items)} 个商品")
+    return items
+
+
+def compile_items(raw) -> list[Item]:
+    """校验并编译 watchlist.json 的内容；所有格式错误一次性报出"""
+    if not isinstance(raw, list):
+        raise WatchlistError("watchlist 顶层必须是列表")
+    errors, items, seen = [], [], set()
+    for n, entry in enumerate(raw, 1):
+        where = f"第 {n} 项"
+        if not isinstance(entry, dict):
+            errors.append(f"{where}: 不是对象")
+            continue
+        name = entry.get("name")
+        if not isinstance(name, str) or not name.strip():
+            errors.append(f"{where}: 缺少 name")
+            continue
+        where = f"{where}（{name}）"
+        if name in seen:
+            errors.append(f"{where}: 名字重复")
+        seen.add(name)
+
+        nums = {}
+        for field, default in (("alert_threshold", DEFAULT_THRESHOLD),
+                               ("alert_below_pct", DEFAULT_BELOW), ("poll_minutes", 0)):
+            v = entry.get(field, default)
+            if isinstance(v, bool) or not isinstance(v, (int, float)) or v < 0:
+                errors.append(f"{where}: {field} 必须是非负数")
+            nums[field] = v
+
+        jobs = []
+        for b in registry.BACKENDS:
+            key = entry.get(b.field)
+            if key is None or (b.gate and not entry.get(b.gate)):
+                continue
+            if b.field == "woolworths_id" and isinstance(key, int):
+                key = str(key)
+            if not isinstance(key, str) or not key.strip():
+                errors.append(f"{where}: {b.field} 必须是非空字符串")
+                continue
+            if b.field == "woolworths_id" and not key.isdigit():
+                errors.append(f"{where}: woolworths_id 应为数字 stockcode")
+                continue
+            if (job := _job(b, key.strip(), where)) is not None:
+                jobs.append(job)
+
+        if unknown := sorted(set(entry) - _KNOWN):
+            print(f"  [watchlist] {where}: 未知字段 {', '.join(unknown)}")
+        if not jobs:
+            print(f"  [watchlist] {where}: 没有任何门店可抓")
+        items.append(Item(name, nums["alert_threshold"], nums["alert_below_pct"],
+                          nums["poll_minutes"], tuple(jobs)))
+    if errors:
+        raise WatchlistError("watchlist 有错误：\n  " + "\n  ".join(errors))
+    return items
+
+
+def _job(backend: registry.Backend, key: str, where: str) -> Job | None:
+    if backend.store != "ALDI":
+        return Job(backend.store, key, "bulk")
+    from scraper import aldi
+    if not (url := aldi.category_for(key)):
+        print(f"  [watchlist] {where}: ALDI 关键词 '{key}' 没有对应的分类页（aldi.CATEGORY_URLS），跳过")
+        return None
+    return Job("ALDI", key, url)
+
+
+def _fingerprint(data: bytes) -> str:
+    """watchlist 内容 + 影响编译结果的代码侧配置（ALDI 分类表，没有 ALDI 商品时不加载 ALDI 后端）"""
+    h = hashlib.sha1(data)
+    h.update(str(PLAN_VERSION).encode())
+    if b"aldi_keyword" in data:
+        from scraper import aldi
+        h.update(json.dumps(aldi.CATEGORY_URLS, sort_keys=True).encode())
+    return h.hexdigest()
+
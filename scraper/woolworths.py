@@ -2,61 +2,126 @@
 Woolworths 爬虫 — cloudscraper 版
 模拟浏览器 TLS 指纹绕过 Cloudflare，完全不需要安装浏览器。
 
-三级降级策略（自动切换）：
+批量模式（get_prices）先用 /apis/ui/products 一次取多个 stockcode，
+没拿到的商品再逐个走三级降级策略（自动切换）：
   1. JSON API  (/apis/ui/product/detail)  — 最快
   2. HTML &q;  编码 JSON                  — API 被拦时的备用
   3. Next.js __NEXT_DATA__ script 标签   — 最后手段
+
+请求走 scraper.conditional：内容没变（304 或哈希相同）时直接复用上次的解析结果。
+被拦时不再逐个商品硬撞（scraper.breaker）：某一级失败率过高后余下商品跳过这一级，
+主机熔断后余下商品直接放弃。
+分店由 Cookie 决定（URL 不变），所以条件请求和响应缓存都按分店 id 区分（variant）。
 """
 import re
 import json
-import cloudscraper
 
-STORE_ID = "3298"   # Woolworths Carnegie North
-POSTCODE = "3163"
+from scraper import breaker, conditional, metrics
+from scraper.branches import DEFAULTS, Branch
+from scraper.records import Record
+
+DEFAULT_BRANCH = DEFAULTS["Woolworths"]   # Carnegie North
+
+BASE_URL  = "https://www.woolworths.com.au"
+BULK_SIZE = 20      # 批量模式每次请求的 stockcode 数
 
-# 全局复用同一个 scraper 实例（复用 session，减少握手次数）
-_scraper = cloudscraper.create_scraper(
-    browser={"browser": "chrome", "platform": "darwin", "mobile": False}
-)
 
 _BASE_HEADERS = {
     "Accept":          "application/json, text/html, */*",
     "Accept-Language": "en-AU,en;q=0.9",
     "Referer":         "https://www.woolworths.com.au/",
-    # Cookie 把门店设为 Carnegie North，使 Specials 显示该门店价格
-    "Cookie":          f"wow-store-id={STORE_ID}; wow-postcode={POSTCODE}",
 }
 
 
-def get_price(product_id: str) -> dict | None:
-    result = _try_api(product_id)
+def _headers(branch: Branch, **extra) -> dict:
+    # Cookie 把门店设为该分店，使 Specials 显示该门店价格
+    return {**_BASE_HEADERS,
+            "Cookie": f"wow-store-id={branch.id}; wow-postcode={branch.postcode}", **extra}
+
+
+def get_price(product_id: str, branch: Branch | None = None) -> Record | None:
+    branch = branch or DEFAULT_BRANCH
+    result = breaker.attempt("Woolworths", "json_api", _try_api, product_id, branch)
     if result:
         return result
     print(f"    [WW] JSON API 无数据，降级到 HTML 提取…")
-    return _try_html(product_id)
+    return breaker.attempt("Woolworths", "html", _try_html, product_id, branch)
+
+
+def get_prices(product_ids: list[str], branch: Branch | None = None) -> dict[str, Record | None]:
+    """
+    批量模式：先按 BULK_SIZE 个 stockcode 一组走 /apis/ui/products 批量接口
+    （门店 Cookie 同样生效），批量没拿到的再逐个走 get_price 的三级降级。
+    """
+    branch = branch or DEFAULT_BRANCH
+    ids = list(dict.fromkeys(product_ids))
+    out = dict.fromkeys(ids)
+    for i in range(0, len(ids), BULK_SIZE):
+        if breaker.blocked(BASE_URL):
+            break
+        out.update(metrics.timed("Woolworths", "bulk", _try_bulk, ids[i:i + BULK_SIZE], branch))
+    for pid in ids:
+        if out[pid] is None:
+            if breaker.blocked(BASE_URL):
+                print(f"    [WW] {breaker.host(BASE_URL)} 熔断中，余下商品跳过")
+                break
+            out[pid] = get_price(pid, branch)
+    return out
+
+
+# ── 批量：/apis/ui/products/{stockcode,stockcode,...} ─────────────────────────
+
+def _try_bulk(product_ids: list[str], branch: Branch) -> dict[str, Record]:
+    wanted = {str(pid): pid for pid in product_ids}
+    url    = f"{BASE_URL}/apis/ui/products/{','.join(wanted)}"
+    try:
+        r, prev = conditional.get("Woolworths", url, headers=_headers(branch),
+                                  variant=branch.id, timeout=20)
+        if prev is not None:
+            return {wanted[k]: v for k, v in prev.items() if k in wanted}
+        if r.status_code != 200:
+            return {}
+        data = r.json()
+    except Exception as e:
+        print(f"    [WW] 批量 API 异常: {e}")
+        return {}
+
+    found = {}
+    for entry in data if isinstance(data, list) else [data]:
+        if not isinstance(entry, dict):
+            continue
+        # 有的版本直接返回商品，有的包一层 {"Products": [...]}
+        products = entry.get("Products") or [entry]
+        for p in products if isinstance(products, list) else ():
+            if not isinstance(p, dict) or str(p.get("Stockcode", "")) not in wanted or not p.get("Price"):
+                continue
+            try:
+                found[str(p["Stockcode"])] = _from_api(p, "bulk_api", branch)
+            except (TypeError, ValueError):
+                continue   # 价格不是数字：这个商品留给逐个抓取
+    for code, result in found.items():
+        conditional.remember(url, code, result, branch.id)
+    return {wanted[code]: result for code, result in found.items()}
 
 
 # ── 策略 1：JSON API ──────────────────────────────────────────────────────────
 
-def _try_api(product_id: str) -> dict | None:
-    url = f"https://www.woolworths.com.au/apis/ui/product/detail/{product_id}"
+def _try_api(product_id: str, branch: Branch) -> Record | None:
+    url = f"{BASE_URL}/apis/ui/product/detail/{product_id}"
     try:
-        r = _scraper.get(url, headers=_BASE_HEADERS, timeout=15)
+        r, prev = conditional.get("Woolworths", url, headers=_headers(branch),
+                                  variant=branch.id, key="", timeout=15)
+        if prev and "" in prev:
+            return prev[""]
         if r.status_code != 200:
             return None
         data = r.json()
         p = data.get("Product") or (data[0] if isinstance(data, list) else data)
-        price = p.get("Price")
-        if not price:
+        if not p.get("Price"):
             return None
-        return _build(
-            name=p.get("Name", ""),
-            price=float(price),
-            was=p.get("WasPrice"),
-            special=bool(p.get("IsOnSpecial")),
-            cup=p.get("CupString", ""),
-            src="json_api",
-        )
+        result = _from_api(p, "json_api", branch)
+        conditional.remember(url, "", result, branch.id)
+        return result
     except Exception as e:
         print(f"    [WW] API 异常: {e}")
         return None
@@ -64,46 +129,76 @@ def _try_api(product_id: str) -> dict | None:
 
 # ── 策略 2 + 3：HTML 页面 ─────────────────────────────────────────────────────
 
-def _try_html(product_id: str) -> dict | None:
-    url = f"https://www.woolworths.com.au/shop/productdetails/{product_id}"
+def _try_html(product_id: str, branch: Branch) -> Record | None:
+    url = f"{BASE_URL}/shop/productdetails/{product_id}"
     try:
-        r = _scraper.get(
+        r, prev = conditional.get(
+            "Woolworths",
             url,
-            headers={**_BASE_HEADERS, "Accept": "text/html"},
+            headers=_headers(branch, Accept="text/html"),
+            variant=branch.id,
+            key="",
             timeout=20,
         )
+        if prev and "" in prev:
+            return prev[""]
         html = r.text
-        return _parse_encoded(html, product_id) or _parse_next_data(html, product_id)
+        result = (metrics.timed("Woolworths", "html_encoded", _parse_encoded, html, product_id)
+                  or metrics.timed("Woolworths", "next_data", _parse_next_data, html, product_id))
+        if result:
+            result = result.with_branch(branch.name)
+            conditional.remember(url, "", result, branch.id)
+        return result
     except Exception as e:
         print(f"    [WW] HTML 异常: {e}")
         return None
 
 
-def _parse_encoded(html: str, pid: str) -> dict | None:
+# 两种解析都先定位商品 JSON 所在的一小段，只解码、只扫描这一段，
+# 不再对几百 KB 的整页做 replace 拷贝和多遍正则。
+
+_ENC_PRICE_RE = re.compile(r'Price(?:&q;|")\s*:\s*([\d.]+)')   # 以字面量开头，走快速子串扫描
+_ENC_WINDOW   = 4096   # Price 前后各取这么多字符作为商品区域
+_NAME_RE      = re.compile(r'"Name"\s*:\s*"([^"]{3,100})"')
+_WAS_RE       = re.compile(r'"WasPrice"\s*:\s*([\d.]+)')
+_SPECIAL_RE   = re.compile(r'"IsOnSpecial"\s*:\s*(true|false)')
+_CUP_RE       = re.compile(r'"CupString"\s*:\s*"([^"]*)"')
+
+_NEXT_TAG        = '<script id="__NEXT_DATA__"'
+_NEXT_PRODUCT_RE = re.compile(r'"product"\s*:\s*\{')
+_json_decoder    = json.JSONDecoder()
+
+
+def _parse_encoded(html: str, pid: str) -> Record | None:
     """&q;Price&q;:2.9 这种 HTML 转义 JSON（Woolworths 常见嵌入方式）"""
-    c = html.replace("&q;", '"').replace("&amp;", "&")
-    pm = re.search(r'"Price"\s*:\s*([\d.]+)', c)
+    # 前面必须紧跟引号，排除 WasPrice / InstorePrice 等
+    pm = next((m for m in _ENC_PRICE_RE.finditer(html)
+               if html.endswith(("&q;", '"'), 0, m.start())), None)
     if not pm:
         return None
+    lo = max(0, pm.start() - _ENC_WINDOW)
+    c  = html[lo:pm.end() + _ENC_WINDOW].replace("&q;", '"').replace("&amp;", "&")
     return _build(
-        name=_rx(r'"Name"\s*:\s*"([^"]{3,100})"', c, f"WW-{pid}"),
+        name=_rx(_NAME_RE, c, f"WW-{pid}"),
         price=float(pm.group(1)),
-        was=float(_rx(r'"WasPrice"\s*:\s*([\d.]+)', c) or 0) or None,
-        special=_rx(r'"IsOnSpecial"\s*:\s*(true|false)', c) == "true",
-        cup=_rx(r'"CupString"\s*:\s*"([^"]*)"', c, ""),
+        was=float(_rx(_WAS_RE, c) or 0) or None,
+        special=_rx(_SPECIAL_RE, c) == "true",
+        cup=_rx(_CUP_RE, c, ""),
         src="html_encoded",
     )
 
 
-def _parse_next_data(html: str, pid: str) -> dict | None:
+def _parse_next_data(html: str, pid: str) -> Record | None:
     """Next.js __NEXT_DATA__ 嵌入 JSON"""
-    m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.+?)</script>', html, re.DOTALL)
-    if not m:
+    start = html.find(_NEXT_TAG)
+    if start < 0:
+        return None
+    body = html.find(">", start) + 1
+    end  = html.find("</script>", body)
+    if body == 0 or end < 0:
         return None
     try:
-        data = json.loads(m.group(1))
-        props = data.get("props", {}).get("pageProps", {})
-        p = props.get("product") or props.get("initialData", {}).get("product")
+        p = _next_data_product(html, body, end)
         if not p:
             return None
         price = p.get("price") or p.get("Price")
@@ -121,21 +216,65 @@ def _parse_next_data(html: str, pid: str) -> dict | None:
         return None
 
 
+def _next_data_product(html: str, body: int, end: int) -> dict | None:
+    """
+    只解码 pageProps 之后第一个 "product": {...} 对象，且它必须直接挂在
+    pageProps 或 pageProps.initialData 下（推荐、相关商品里的 product 不算）；
+    否则、或里面没有价格时，退回解析整个 __NEXT_DATA__。
+    """
+    props_at = html.find('"pageProps"', body, end)
+    m = _NEXT_PRODUCT_RE.search(html, props_at, end) if props_at >= 0 else None
+    if m and _open_keys(html, props_at, m.start()) in _PRODUCT_PARENTS:
+        try:
+            p, stop = _json_decoder.raw_decode(html, m.end() - 1)
+            if stop <= end and (p.get("price") or p.get("Price")):
+                return p
+        except ValueError:
+            pass
+    data  = json.loads(html[body:end])
+    props = data.get("props", {}).get("pageProps", {})
+    return props.get("product") or props.get("initialData", {}).get("product")
+
+
+_PRODUCT_PARENTS = (["pageProps"], ["pageProps", "initialData"])
+_JSON_TOKEN_RE   = re.compile(r'"(?:[^"\\]|\\.)*"\s*:?|[{}\[\]]')
+
+
+def _open_keys(html: str, start: int, stop: int) -> list[str | None]:
+    """start..stop 之间尚未闭合的容器各自挂在哪个键下（数组和无键的为 None）"""
+    stack, key = [], None
+    for t in _JSON_TOKEN_RE.finditer(html, start, stop):
+        tok = t.group()
+        if tok[0] == '"':
+            key = tok.rstrip(" \t\r\n:")[1:-1] if tok.endswith(":") else None
+        elif tok in "{[":
+            stack.append(key if tok == "{" else None)
+            key = None
+        else:
+            if stack:
+                stack.pop()
+            key = None
+    return stack
+
+
 # ── 工具 ──────────────────────────────────────────────────────────────────────
 
-def _rx(pattern: str, text: str, default=None):
-    m = re.search(pattern, text)
+def _rx(pattern: re.Pattern, text: str, default=None):
+    m = pattern.search(text)
     return m.group(1) if m else default
 
 
-def _build(name, price, was, special, cup, src) -> dict:
-    return {
-        "store":      "Woolworths",
-        "branch":     "Carnegie North #3298",
-        "name":       name,
-        "price":      price,
-        "was_price":  was,
-        "unit_price": cup,
-        "on_special": special,
-        "source":     src,
-    }
+def _from_api(p: dict, src: str, branch: Branch) -> Record:
+    return _build(
+        name=p.get("Name", ""),
+        price=float(p["Price"]),
+        was=p.get("WasPrice"),
+        special=bool(p.get("IsOnSpecial")),
+        cup=p.get("CupString", ""),
+        src=src,
+        branch=branch,
+    )
+
+
+def _build(name, price, was, special, cup, src, branch: Branch = DEFAULT_BRANCH) -> Record:
+    return Record("Woolworths", branch.name, name, price, was, cup, special, src)
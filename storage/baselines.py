@@ -0,0 +1,45 @@
+"""
+价格基线 — scraper.changes.BaselineDetector 的增量统计，存在 data/history.db 的 baselines 表
+
+每个 (item, store, branch) 一行 JSON，每次运行只写回更新过的行；
+表是空的（首次运行 / 新建库）时从 observations 重放一次建基线，之后不再扫历史。
+"""
+import json
+import sqlite3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS baselines (
+    item   TEXT NOT NULL,
+    store  TEXT NOT NULL,
+    branch TEXT NOT NULL DEFAULT '',
+    state  TEXT NOT NULL,
+    PRIMARY KEY (item, store, branch)
+) WITHOUT ROWID;
+"""
+
+
+def load(conn: sqlite3.Connection, detector):
+    """把已保存的基线装进 detector；没有就从历史重放"""
+    conn.executescript(_SCHEMA)
+    rows = conn.execute("SELECT item, store, branch, state FROM baselines").fetchall()
+    if rows:
+        detector.load({(r[0], r[1], r[2]): json.loads(r[3]) for r in rows})
+        return
+    from storage import history
+    detector.replay(history.replay(conn))
+    n = save(conn, detector)
+    if n:
+        print(f"  [baselines] 已从价格历史建立 {n} 条基线")
+
+
+def save(conn: sqlite3.Connection, detector) -> int:
+    """写回上次保存以来更新过的基线，返回行数"""
+    conn.executescript(_SCHEMA)
+    dirty = detector.dirty()
+    with conn:
+        conn.executemany(
+            "INSERT INTO baselines (item, store, branch, state) VALUES (?,?,?,?) "
+            "ON CONFLICT (item, store, branch) DO UPDATE SET state = excluded.state",
+            [(*key, json.dumps(state)) for key, state in dirty.items()],
+        )
+    return len(dirty)
@@ -0,0 +1,157 @@
+"""
+价格历史 — SQLite 追加式存储（data/history.db）
+
+observations 表每次运行只追加本次抓到的记录，从不改写旧行；
+latest 表按 (item, store, branch) 指向最新一行，读取"上一次价格"时只走主键，
+不需要扫描全部历史。
+"""
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from scraper.records import UNIT_KEYS, Record
+
+DB_FILE     = Path("data/history.db")
+LEGACY_FILE = Path("data/prices.json")   # 旧版整份覆盖的快照，首次运行时导入
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    ts         TEXT    NOT NULL,
+    item       TEXT    NOT NULL,
+    store      TEXT    NOT NULL,
+    branch     TEXT,
+    name       TEXT,
+    price      REAL,
+    was_price  REAL,
+    on_special INTEGER NOT NULL DEFAULT 0,
+    unit       TEXT,
+    source     TEXT
+);
+CREATE INDEX IF NOT EXISTS obs_item_store_ts ON observations (item, store, ts);
+CREATE INDEX IF NOT EXISTS obs_item_ts       ON observations (item, ts);
+CREATE INDEX IF NOT EXISTS obs_ts            ON observations (ts);
+"""
+
+_LATEST_TABLE = """
+CREATE TABLE IF NOT EXISTS latest (
+    item   TEXT    NOT NULL,
+    store  TEXT    NOT NULL,
+    branch TEXT    NOT NULL DEFAULT '',
+    obs_id INTEGER NOT NULL,
+    PRIMARY KEY (item, store, branch)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS   = "ts, item, store, branch, name, price, was_price, on_special, unit, source"
+_O_COLUMNS = ", ".join(f"o.{c}" for c in _COLUMNS.split(", "))
+
+
+def connect(path: Path = DB_FILE) -> sqlite3.Connection:
+    path.parent.mkdir(exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    _migrate_latest(conn)
+    conn.executescript(_SCHEMA + _LATEST_TABLE)
+    if path == DB_FILE and LEGACY_FILE.exists() and _is_empty(conn):
+        _import_legacy(conn)
+    return conn
+
+
+def append(conn: sqlite3.Connection, snapshot: dict, ts: str | None = None) -> int:
+    """把一次运行的快照 {item: {store: record}} 追加进历史，返回写入行数"""
+    return append_stream(conn, (
+        (item, store, r) for item, stores in snapshot.items() for store, r in stores.items() if r
+    ), ts)
+
+
+def append_stream(conn: sqlite3.Connection, stream, ts: str | None = None) -> int:
+    """(item, store, record) 观测流追加进历史（多分店扇出的结果走这里）"""
+    ts = ts or datetime.now().isoformat(timespec="seconds")
+    rows = 0
+    with conn:
+        for item, store, r in stream:
+            cur = conn.execute(
+                f"INSERT INTO observations ({_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (ts, item, store, r.get("branch"), r.get("name"), r.get("price"),
+                 r.get("was_price"), int(bool(r.get("on_special"))),
+                 r.get(UNIT_KEYS.get(store, "unit")), r.get("source")),
+            )
+            conn.execute(
+                "INSERT INTO latest (item, store, branch, obs_id) VALUES (?,?,?,?) "
+                "ON CONFLICT (item, store, branch) DO UPDATE SET obs_id = excluded.obs_id",
+                (item, store, r.get("branch") or "", cur.lastrowid),
+            )
+            rows += 1
+    return rows
+
+
+def latest(conn: sqlite3.Connection) -> dict:
+    """
+    每个 (item, store) 最新一条记录，还原成快照格式；
+    同一门店有多个分店时取最后写入的那个（要区分分店用 latest_branches）。
+    """
+    snapshot = {}
+    for row in _latest_rows(conn):
+        snapshot.setdefault(row["item"], {})[row["store"]] = to_record(row)
+    return snapshot
+
+
+def latest_branches(conn: sqlite3.Connection) -> dict:
+    """每个 (item, store, branch) 最新一条记录：扁平快照 {(item, store, branch): record}"""
+    return {(row["item"], row["store"], row["branch"] or ""): to_record(row)
+            for row in _latest_rows(conn)}
+
+
+def _latest_rows(conn: sqlite3.Connection):
+    return conn.execute(
+        f"SELECT {_O_COLUMNS} FROM latest l "
+        "JOIN observations o ON o.rowid = l.obs_id ORDER BY o.rowid"
+    )
+
+
+def replay(conn: sqlite3.Connection):
+    """按写入顺序流出全部历史：(item, store, record, ts 秒)"""
+    for row in conn.execute(f"SELECT {_COLUMNS} FROM observations ORDER BY rowid"):
+        yield row["item"], row["store"], to_record(row), datetime.fromisoformat(row["ts"]).timestamp()
+
+
+def to_record(row: sqlite3.Row) -> Record:
+    """数据库行 → Record（键名与各 scraper _build 相同）"""
+    return Record(row["store"], row["branch"] or "", row["name"] or "", row["price"], row["was_price"],
+                  row["unit"] or "", bool(row["on_special"]), row["source"] or "")
+
+
+def _migrate_latest(conn: sqlite3.Connection):
+    """
+    旧版 latest 表按 (item, store) 建主键：按分店重建。
+    删表、建表、回填在同一个事务里（sqlite3 不会为 DDL 自动开事务，要显式 BEGIN；
+    executescript 会先提交，所以也不能用），中途中断时旧表原样保留。
+    """
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(latest)")]
+    if not cols or "branch" in cols:
+        return
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE latest")
+        conn.execute(_LATEST_TABLE)
+        conn.execute(
+            "INSERT INTO latest (item, store, branch, obs_id) "
+            "SELECT item, store, COALESCE(branch, ''), MAX(rowid) FROM observations "
+            "GROUP BY item, store, COALESCE(branch, '')"
+        )
+
+
+def _is_empty(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM observations LIMIT 1").fetchone() is None
+
+
+def _import_legacy(conn: sqlite3.Connection):
+    try:
+        snapshot = json.loads(LEGACY_FILE.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"  [history] 旧快照导入失败: {e}")
+        return
+    ts = datetime.fromtimestamp(LEGACY_FILE.stat().st_mtime).isoformat(timespec="seconds")
+    n = append(conn, snapshot, ts)
+    print(f"  [history] 已从 {LEGACY_FILE} 导入 {n} 条记录")
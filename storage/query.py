@@ -0,0 +1,119 @@
+"""
+价格历史只读查询 — 给 api.py 的 HTTP 服务和命令行用
+
+只读打开 data/history.db（mode=ro，不建表、不迁移、不和正在写入的抓取抢锁），
+每个查询都走索引：
+  latest    latest 表按 (item, store, branch) 指向最新一行
+  series    obs_item_ts / obs_item_store_ts，按时间顺序流出，不排序整表
+  cheapest  在 latest 上按商品取最低价
+  items     latest 上的商品概览
+所有查询都是生成器，逐行产出 dict；ndjson / csv 同样逐行编码，
+几十万行的时间序列也不会先攒成一个大列表。
+"""
+import csv
+import json
+import sqlite3
+from pathlib import Path
+
+from storage.history import DB_FILE
+
+COLUMNS = ("ts", "item", "store", "branch", "name", "price", "was_price", "on_special", "unit", "source")
+
+_O_COLUMNS = ", ".join(f"o.{c}" for c in COLUMNS)
+
+
+def connect(path: Path = DB_FILE) -> sqlite3.Connection:
+    if not path.exists():
+        raise FileNotFoundError(f"{path} 不存在，先运行一次 monitor.py")
+    conn = sqlite3.connect(f"file:{path.resolve()}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def latest(conn: sqlite3.Connection, item: str | None = None, store: str | None = None):
+    """每个 (item, store, branch) 的最新记录"""
+    where, args = _filters(("l.item", item), ("l.store", store))
+    yield from _rows(conn.execute(
+        f"SELECT {_O_COLUMNS} FROM latest l JOIN observations o ON o.rowid = l.obs_id "
+        f"{where} ORDER BY l.item, l.store, l.branch", args))
+
+
+def series(conn: sqlite3.Connection, item: str, store: str | None = None, branch: str | None = None,
+           since: str | None = None, until: str | None = None):
+    """某个商品的价格时间序列（since / until 为 ISO 日期或时间，until 不含）"""
+    where, args = _filters(("item", item), ("store", store), ("COALESCE(branch, '')", branch),
+                           ("ts >=", since), ("ts <", until))
+    yield from _rows(conn.execute(f"SELECT {', '.join(COLUMNS)} FROM observations {where} ORDER BY ts", args))
+
+
+def cheapest(conn: sqlite3.Connection, store: str | None = None):
+    """
+    每个商品当前最便宜的门店（按最新价，同价取先写入的）；
+    给了 store 时只列出该门店最便宜的商品。多出 stores（有价门店数）和 next_price（次低价）两列。
+    """
+    rows = conn.execute(
+        f"SELECT * FROM (SELECT {_O_COLUMNS}, "
+        "ROW_NUMBER() OVER (PARTITION BY l.item ORDER BY o.price, o.rowid) AS rank, "
+        "COUNT(*) OVER (PARTITION BY l.item) AS stores, "
+        "LEAD(o.price) OVER (PARTITION BY l.item ORDER BY o.price, o.rowid) AS next_price "
+        "FROM latest l JOIN observations o ON o.rowid = l.obs_id WHERE o.price IS NOT NULL) "
+        f"WHERE rank = 1{' AND store = ?' if store else ''} ORDER BY item",
+        (store,) if store else (),
+    )
+    for row in rows:
+        out = {c: row[c] for c in COLUMNS}
+        out["on_special"] = bool(out["on_special"])
+        out["stores"], out["next_price"] = row["stores"], row["next_price"]
+        yield out
+
+
+def items(conn: sqlite3.Connection):
+    """商品概览：门店数、当前最低 / 最高价、最近一次观测时间"""
+    for row in conn.execute(
+        "SELECT l.item, COUNT(*) AS stores, MIN(o.price) AS low, MAX(o.price) AS high, MAX(o.ts) AS ts "
+        "FROM latest l JOIN observations o ON o.rowid = l.obs_id GROUP BY l.item ORDER BY l.item"
+    ):
+        yield dict(row)
+
+
+def _filters(*pairs) -> tuple[str, list]:
+    """(列, 值) → WHERE 子句；值为 None 的不加条件，列名里带比较符的按原样用"""
+    conds, args = [], []
+    for col, val in pairs:
+        if val is not None:
+            conds.append(f"{col} ?" if col.endswith((">=", "<")) else f"{col} = ?")
+            args.append(val)
+    return ("WHERE " + " AND ".join(conds) if conds else ""), args
+
+
+def _rows(cursor):
+    for row in cursor:
+        out = dict(zip(COLUMNS, row))
+        out["on_special"] = bool(out["on_special"])
+        yield out
+
+
+# ── 流式编码 ─────────────────────────────────────────────────────────────────
+
+def ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows):
+    """表头取第一行的键；没有行时只输出空串"""
+    buf = _Line()
+    out = csv.writer(buf)
+    header = None
+    for row in rows:
+        if header is None:
+            header = list(row)
+            yield out.writerow(header)
+        yield out.writerow([row.get(c) for c in header])
+
+
+class _Line:
+    """csv.writer 的"文件"：writerow 直接返回写出的那一行"""
+
+    def write(self, line: str) -> str:
+        return line
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# scraper / storage 是仓库根目录下的命名空间包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,136 @@
+from contextlib import closing
+from datetime import datetime
+
+from scraper.changes import MIN_HISTORY, Alert, BaselineDetector
+from scraper.notify import price_change_message
+from scraper.records import Record
+from storage import baselines, history
+
+WEEK = 7 * 86400
+T0   = 1_780_000_000
+
+REGULAR = (5.0, False)
+SPECIAL = (4.0, True)
+# 开头一次深度特价：之后的降价都高于历史 / 90 天最低，只可能触发"跌破基线"
+SETTLED = [(3.0, True)] + [REGULAR] * 6
+# 每周在原价和特价之间来回跳；第 12 周特价更深，第 28 周是 90 天内（但不是历史）的新低
+WEEKLY = ([REGULAR, SPECIAL] * 6 + [(3.5, True), REGULAR]
+          + [REGULAR, SPECIAL] * 7 + [(3.8, True)])
+
+
+def _record(price, special, branch="Carnegie Central"):
+    return Record("Coles", branch, "Eggs 12pk", price, on_special=special, source="api")
+
+
+def _kinds(detector, series, start=0, item="Eggs"):
+    out = []
+    for w, (price, special) in enumerate(series, start):
+        alert = detector.observe(item, "Coles", _record(price, special), T0 + w * WEEK)
+        out.append(alert and alert.kind)
+    return out
+
+
+def _alerts(kinds):
+    return [(w, k) for w, k in enumerate(kinds) if k]
+
+
+def test_weekly_special_series_alerts_once_per_real_event():
+    kinds = _kinds(BaselineDetector(), WEEKLY)
+    assert _alerts(kinds) == [
+        (3, "below"),    # 第二次见到特价：周期还没摸清，跌破基线提醒一次
+        (12, "low"),     # 比以往所有特价都低
+        (28, "low90"),   # 3.5 已滑出 90 天窗口
+    ]
+
+
+def test_no_alerts_before_min_history():
+    d = BaselineDetector()
+    falling = [(5.0 - n, True) for n in range(MIN_HISTORY)]   # 每次都是"新低"
+    assert _kinds(d, falling) == [None] * MIN_HISTORY
+    assert d.observe("Eggs", "Coles", _record(0.5, True), T0 + MIN_HISTORY * WEEK).kind == "low"
+
+
+def test_below_is_edge_triggered():
+    d = BaselineDetector()
+    _kinds(d, SETTLED)
+    n = len(SETTLED)
+    # 一直低于基线只提醒一次；回到原价后再跌下去才再提醒
+    assert _kinds(d, [(4.2, False)] * 2 + [REGULAR, (4.0, False)], start=n) == ["below", None, None, "below"]
+
+
+def test_expected_special_is_suppressed_but_regular_price_cut_is_not():
+    d = BaselineDetector()
+    _kinds(d, [REGULAR, SPECIAL] * 4)
+    assert d.baseline("Eggs", "Coles", "Carnegie Central").expected_special(4.0)
+    # 同样的价格，不是特价：是真的降价
+    assert _kinds(d, [REGULAR, (4.0, False)], start=8) == [None, "below"]
+
+
+def test_per_item_below_threshold():
+    series = SETTLED + [(4.2, False)]   # 比基线低约 14%
+    assert _kinds(BaselineDetector(), series)[-1] == "below"
+    assert _kinds(BaselineDetector(thresholds={"Eggs": 0.25}), series)[-1] is None
+
+
+def test_branches_have_separate_baselines():
+    d = BaselineDetector()
+    for w, (price, special) in enumerate(SETTLED):
+        d.observe("Eggs", "Coles", _record(price, special, "A"), T0 + w * WEEK)
+    n = len(SETTLED)
+    assert d.observe("Eggs", "Coles", _record(4.2, False, "B"), T0 + n * WEEK) is None   # B 分店第一次出现
+    assert d.observe("Eggs", "Coles", _record(4.2, False, "A"), T0 + n * WEEK).kind == "below"
+
+
+# ── 持久化（storage.baselines） ──────────────────────────────────────────────
+
+def test_saved_baselines_reproduce_the_same_alerts(tmp_path):
+    half = len(WEEKLY) // 2
+    live = BaselineDetector()
+    _kinds(live, WEEKLY[:half])
+
+    with closing(history.connect(tmp_path / "h.db")) as conn:
+        assert baselines.save(conn, live) == 1
+        assert baselines.save(conn, live) == 0   # 没有新观测：不重写
+        restored = BaselineDetector()
+        baselines.load(conn, restored)
+
+    rest = WEEKLY[half:]
+    assert _kinds(restored, rest, start=half) == _kinds(live, rest, start=half)
+    assert restored.state() == live.state()
+
+
+def test_empty_table_is_bootstrapped_from_history(tmp_path):
+    half = len(WEEKLY) // 2
+    conn = history.connect(tmp_path / "h.db")
+    for w, (price, special) in enumerate(WEEKLY[:half]):
+        ts = datetime.fromtimestamp(T0 + w * WEEK).isoformat(timespec="seconds")
+        history.append(conn, {"Eggs": {"Coles": _record(price, special)}}, ts)
+
+    restored = BaselineDetector()
+    baselines.load(conn, restored)
+    assert conn.execute("SELECT COUNT(*) FROM baselines").fetchone()[0] == 1
+
+    live = BaselineDetector()
+    _kinds(live, WEEKLY[:half])
+    rest = WEEKLY[half:]
+    assert _kinds(restored, rest, start=half) == _kinds(live, rest, start=half)
+
+    # 表里已有基线：下次 load 直接读表，不再重放历史
+    again = BaselineDetector()
+    conn.execute("DELETE FROM observations")
+    conn.commit()
+    baselines.load(conn, again)
+    assert again.baseline("Eggs", "Coles", "Carnegie Central").n == half
+    conn.close()
+
+
+# ── 通知文本 ─────────────────────────────────────────────────────────────────
+
+def test_message_survives_zero_baseline():
+    alerts = [
+        Alert("Milk", "Coles", "Carnegie Central", None, 1.5, None, kind="below", baseline=0.0),
+        Alert("Eggs", "Coles", "Carnegie Central", None, 4.0, None, kind="below", baseline=5.0),
+    ]
+    text = price_change_message(alerts)
+    assert text.index("Eggs") < text.index("Milk")   # 按便宜的比例排，基线为 0 的排最后
+    assert "-20%" in text and "-0%" in text
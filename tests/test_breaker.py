@@ -0,0 +1,61 @@
+import pytest
+
+from scraper import breaker, throttle
+
+URL = "https://www.woolworths.com.au/apis/ui/product/detail/1"
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(breaker, "_hosts", {})
+    monkeypatch.setattr(breaker, "_strategies", {})
+    monkeypatch.setattr(breaker, "BACKOFF_BASE", 0)
+    throttle.configure("Woolworths", 0, 0)
+
+
+def _fetch(status):
+    """一次请求：把状态码交给 breaker，然后像策略那样解析不出价格"""
+    def fn():
+        breaker.record("Woolworths", URL, status, 0.01)
+        return None
+    return fn
+
+
+def test_empty_results_do_not_kill_a_strategy():
+    for _ in range(breaker.MIN_TRIES * 3):
+        breaker.attempt("Woolworths", "json_api", _fetch(200))
+    calls = []
+    breaker.attempt("Woolworths", "json_api", lambda: calls.append(1))
+    assert calls == [1]
+
+
+def test_endpoint_errors_kill_a_strategy():
+    for _ in range(breaker.MIN_TRIES):
+        breaker.attempt("Woolworths", "json_api", _fetch(403))
+    calls = []
+    assert breaker.attempt("Woolworths", "json_api", lambda: calls.append(1)) is None
+    assert calls == []
+    # 其他策略不受影响
+    breaker.attempt("Woolworths", "html", lambda: calls.append(1))
+    assert calls == [1]
+
+
+def test_exceptions_count_as_failures():
+    def boom():
+        raise RuntimeError("x")
+    for _ in range(breaker.MIN_TRIES):
+        with pytest.raises(RuntimeError):
+            breaker.attempt("Woolworths", "html", boom)
+    assert breaker.attempt("Woolworths", "html", lambda: "hit") is None
+
+
+def test_host_circuit_opens_after_consecutive_failures_and_recovers():
+    for _ in range(breaker.FAILURES):
+        breaker.record("Woolworths", URL, 503, 0.01)
+    assert breaker.blocked(URL)
+    with pytest.raises(breaker.CircuitOpen):
+        breaker.check(URL)
+    breaker._hosts["www.woolworths.com.au"].opened -= breaker.COOLDOWN + 1
+    breaker.check(URL)   # 冷却结束：放一个探测请求
+    breaker.record("Woolworths", URL, 200, 0.01)
+    assert not breaker.blocked(URL)
@@ -0,0 +1,33 @@
+import pytest
+import requests
+
+from scraper import cache
+
+URL = "https://www.aldi.com.au/products/dairy-eggs-fridge/k/950000000"
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "DB_FILE", tmp_path / "cache.db")
+    monkeypatch.setattr(cache, "_conn", None)
+    monkeypatch.setattr(cache, "TTL", dict(cache.TTL, ALDI=3 * 3600))
+    monkeypatch.setattr(cache, "enabled", True)
+    yield
+    cache._conn.close()
+
+
+def _resp():
+    r = requests.Response()
+    r.status_code, r.url, r._content = 200, URL, b"<html>eggs</html>"
+    return r
+
+
+def test_cap_shortens_ttl_and_hides_older_entries():
+    cache.put("ALDI", URL, None, _resp())
+    assert cache.lookup("ALDI", URL).content == b"<html>eggs</html>"
+    cache.cap(3600)
+    assert cache.TTL["ALDI"] == 3600 and cache.TTL["Coles"] == 20 * 60
+    # cap 之前按 3 小时存的条目不知道有多旧：不再命中
+    assert cache.lookup("ALDI", URL) is None
+    cache.put("ALDI", URL, None, _resp())
+    assert cache.lookup("ALDI", URL) is not None
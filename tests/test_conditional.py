@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from scraper import conditional, fetch, woolworths
+
+URL = "https://www.woolworths.com.au/apis/ui/product/detail/165367"
+
+
+class _Resp:
+    def __init__(self, status_code, body=b"", etag=None):
+        self.status_code = status_code
+        self.content     = body
+        self.headers     = {"ETag": etag} if etag else {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Server:
+    """带 ETag 的假上游：If-None-Match 对得上就回 304"""
+
+    def __init__(self, body: dict, etag: str = '"v1"'):
+        self.body, self.etag, self.sent = json.dumps(body).encode(), etag, []
+
+    def get(self, store, url, *, headers, **kwargs):
+        self.sent.append(headers.get("If-None-Match"))
+        if headers.get("If-None-Match") == self.etag:
+            return _Resp(304)
+        return _Resp(200, self.body, self.etag)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(conditional, "STORE_FILE", tmp_path / "validators.json")
+    monkeypatch.setattr(conditional, "RECORDS_FILE", tmp_path / "records.bin")
+    monkeypatch.setattr(conditional, "_store", None)
+    monkeypatch.setattr(conditional, "_seen", {})
+    srv = _Server({"Product": {"Stockcode": 165367, "Name": "Eggs 12pk", "Price": 5.8}})
+    monkeypatch.setattr(fetch, "get", srv.get)
+    return srv
+
+
+def _next_run():
+    """模拟新进程：内存里的状态清空，只剩磁盘上的文件"""
+    conditional._store = None
+    conditional._seen  = {}
+
+
+def _price():
+    r = woolworths._try_api("165367", woolworths.DEFAULT_BRANCH)
+    return r and r.price
+
+
+def test_not_modified_reuses_the_saved_record(server):
+    assert _price() == 5.8
+    conditional.save()
+    _next_run()
+    assert _price() == 5.8
+    assert server.sent == [None, '"v1"']
+
+
+def test_lost_records_file_drops_its_validators(server):
+    assert _price() == 5.8
+    conditional.save()
+    conditional.RECORDS_FILE.unlink()
+    _next_run()
+    assert _price() == 5.8
+    assert server.sent == [None, None]   # 没有记录可复用：不再发 If-None-Match
+
+
+def test_missing_key_after_304_refetches_full_content(server):
+    assert _price() == 5.8
+    conditional.save()
+    _next_run()
+    # 同一 URL 的校验信息还在，但要的键没有记录
+    resp, records = conditional.get("Woolworths", URL, headers={}, variant=woolworths.DEFAULT_BRANCH.id,
+                                    key="other")
+    assert records is None and resp.status_code == 200
+    assert server.sent == [None, '"v1"', None]
@@ -0,0 +1,38 @@
+import json
+
+from scraper.health import EndpointHealth
+
+BASE = "https://www.coles.com.au/_next/data/abc/en/search/products.json"
+
+
+def test_steady_success_does_not_rewrite_the_file(tmp_path):
+    path = tmp_path / "endpoints.json"
+    h = EndpointHealth(path)
+    h.record(BASE, "0584", True)
+    h.save()
+    assert not path.exists()
+
+    h.record(BASE, "0584", False)
+    h.save()
+    assert json.loads(path.read_text())[f"{BASE} 0584"]["streak"] == 1
+    h.record(BASE, "0584", True)
+    h.save()
+    assert json.loads(path.read_text()) == {}
+
+    before = path.stat().st_mtime_ns
+    again = EndpointHealth(path)
+    for _ in range(5):
+        again.record(BASE, "0584", True)
+    again.save()
+    assert path.stat().st_mtime_ns == before
+
+
+def test_failing_combination_is_skipped_until_cooldown(tmp_path):
+    h = EndpointHealth(tmp_path / "endpoints.json", threshold=2, cooldown=60)
+    for _ in range(2):
+        h.record(BASE, "0584", False)
+    assert h.skip(BASE, "0584") and not h.skip(BASE, None)
+    assert h.failing(BASE)
+    h.save()
+    assert EndpointHealth(h.path, threshold=2, cooldown=60).skip(BASE, "0584")
+    assert not EndpointHealth(h.path, threshold=2, cooldown=0).skip(BASE, "0584")
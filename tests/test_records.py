@@ -0,0 +1,80 @@
+import json
+import math
+
+import pytest
+
+from scraper import records
+from scraper.records import Record
+
+
+def _ww(**kw):
+    return Record("Woolworths", "Carnegie North", "Eggs 12pk", 5.8, **kw)
+
+
+def test_round_trip_keeps_every_field():
+    snap = {
+        ("https://a/1", "165367"): _ww(was_price=6.5, unit="$0.48 / 1EA", on_special=True, source="bulk_api"),
+        ("https://a/1", "165368"): Record("Coles", "Carnegie Central", "Milk 2L", 3.1, source="api"),
+        ("https://b/2", "milk"):   Record("ALDI", "", "Farmdale Milk 2L", 2.99, source="new"),
+    }
+    out = records.loads(records.dumps(snap))
+    assert list(out) == list(snap)
+    for key, r in snap.items():
+        assert dict(out[key]) == dict(r)
+        assert isinstance(out[key], Record)
+
+
+def test_none_prices_survive_as_none_not_nan():
+    snap = {("u", "k"): Record("Coles", "", "Gone", None, was_price=None)}
+    r = records.loads(records.dumps(snap))[("u", "k")]
+    assert r.price is None and r.was_price is None
+    # 真实的价格里不会混进 NaN
+    r = records.loads(records.dumps({("u", "k"): _ww(was_price=0.0)}))[("u", "k")]
+    assert r.price == 5.8 and r.was_price == 0.0 and not math.isnan(r.was_price)
+
+
+def test_plain_dicts_are_accepted_and_unicode_is_kept():
+    d = {"store": "Woolworths", "branch": "Carnegie North", "name": "Café Latte 1L", "price": 2.5,
+         "was_price": None, "unit_price": "$2.50 / 1L", "on_special": False, "source": "json_api"}
+    r = records.loads(records.dumps({("网址", "键"): d}))[("网址", "键")]
+    assert dict(r) == d
+
+
+def test_empty_snapshot():
+    data = records.dumps({})
+    assert records.loads(data) == {}
+
+
+def test_arity_mismatch_is_rejected():
+    with pytest.raises(ValueError):
+        records.dumps({("a", "b"): _ww(), ("a",): _ww()})
+
+
+def test_bad_magic_is_rejected():
+    data = bytearray(records.dumps({("u", "k"): _ww()}))
+    data[:5] = b"XXXXX"
+    with pytest.raises(ValueError):
+        records.loads(bytes(data))
+
+
+def test_mapping_keys_match_the_old_dict_records():
+    assert list(_ww()) == ["store", "branch", "name", "price", "was_price", "unit_price", "on_special", "source"]
+    coles = Record("Coles", "", "Milk", 3.1, unit="$1.55 / 1L")
+    assert list(coles) == ["store", "branch", "name", "price", "was_price", "unit", "on_special", "source"]
+    assert coles["unit"] == "$1.55 / 1L"
+    aldi = Record("ALDI", "", "Milk", 2.99)
+    assert "unit" not in aldi and "unit_price" not in aldi
+    with pytest.raises(KeyError):
+        _ww()["unit"]
+
+
+def test_to_json_uses_the_legacy_prices_layout():
+    snap = {"Eggs": {"Woolworths": _ww(source="bulk_api"), "Coles": None}}
+    assert json.loads(records.to_json(snap)) == {
+        "Eggs": {
+            "Woolworths": {"store": "Woolworths", "branch": "Carnegie North", "name": "Eggs 12pk",
+                           "price": 5.8, "was_price": None, "unit_price": "", "on_special": False,
+                           "source": "bulk_api"},
+            "Coles": None,
+        }
+    }